@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import time
+from core.calibration import PARAMS, CalibrationData, calibrate, load_ground_truth
+from core.detection_cache import DetectionCache
+from config import config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="کالیبراسیون خودکار آستانه‌ها از روی کش دت‌ها و رویدادهای برچسب‌خورده")
+    parser.add_argument("caches", nargs="+", help="پوشه‌های کش دت‌ها (یا پوشه‌ی والد همه‌ی کش‌ها)")
+    parser.add_argument("--truth", required=True, help="CSV با ستون‌های video,time,type (discharge/missing_tooth)")
+    parser.add_argument("--tolerance", type=float, default=2.0, help="فاصله مجاز زمانی تطبیق رویداد (ثانیه)")
+    parser.add_argument("--rounds", type=int, default=3, help="تعداد دورهای ریزتر کردن شبکه")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", default="calibrated_config.json")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.caches:
+        if DetectionCache.exists(path):
+            paths.append(path)
+        else:
+            paths += [os.path.join(path, d) for d in sorted(os.listdir(path))
+                      if DetectionCache.exists(os.path.join(path, d))]
+
+    try:
+        truth = load_ground_truth(args.truth)   # قبل از خواندن کش‌ها، تا برچسب اشتباه زود گزارش شود
+    except ValueError as e:
+        parser.error(str(e))
+
+    start = time.time()
+    datasets = [CalibrationData(path) for path in paths]
+    ranked = calibrate(datasets, truth, config, args.tolerance, args.rounds)
+    print(f"{len(datasets)} videos, {len(ranked)} configs evaluated in {time.time() - start:.1f}s\n")
+
+    labels = ("enter", "exit", "tooth_area", "tooth_min", "min_time", "min_frames")
+    print("  ".join(f"{label:>10}" for label in labels) + f"  {'precision':>9}  {'recall':>6}  {'f1':>5}  {'dis_f1':>6}")
+    for row in ranked[:args.top]:
+        print("  ".join(f"{row[p]:>10}" for p in PARAMS) +
+              f"  {row['precision']:>9.3f}  {row['recall']:>6.3f}  {row['f1']:>5.3f}  {row['discharge_f1']:>6.3f}")
+
+    best = {p: ranked[0][p] for p in PARAMS}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(best, f, indent=2)
+    print(f"\nbest config -> {args.output} (برای config.py):")
+    for p in PARAMS:
+        print(f'    "{p}": {best[p]},')
@@ -2,6 +2,17 @@ config = {
     # --- تنظیمات ورودی و مدل ---
     "input_source": "/home/shovel/Downloads/Documents/tempYoloShovel/files/output_2025-01-31_11-48-58.mp4",       # مسیر فایل ویدیو یا 0 برای وب‌کم
     "model_path": "/home/shovel/Downloads/Documents/tempYoloShovel/assets/weights/img1024_notSorting.pt",        # مسیر فایل مدل YOLO
+    "gate_model_path": None,                       # مدل سبک (تشخیص یا طبقه‌بند) برای تشخیص حضور bucket؛ None = بدون cascade
+    "gate_imgsz": 256,                             # اندازه ورودی مدل سبک
+    "gate_conf": 0.5,                              # حداقل اطمینان/احتمال bucket در مدل سبک
+    "gate_min_bucket_area": 0,                     # حداقل مساحت bucket (پیکسل تصویر اصلی) برای اجرای مدل اصلی؛ فقط مدل سبک تشخیص (برای طبقه‌بند اعمال نمی‌شود)
+    "input_sources": [],                           # چند دوربین با یک مدل مشترک (multi_camera.py)؛ خالی = فقط input_source
+    "detection_cache_dir": "cache/detections",     # کش دت‌های replay (کالیبراسیون بدون اجرای دوباره مدل)
+    "imgsz": None,                                 # اندازه ورودی شبکه (letterbox)؛ None = اندازه آموزش مدل از متادیتا
+    "roi_inference": False,                        # دو مرحله‌ای: پیدا کردن bucket با رزولوشن پایین، بعد برش اطراف آن برای دندان‌ها (فقط مدل pt؛ مدل export شده یک مرحله‌ای اجرا می‌شود)
+    "roi_search_imgsz": 320,                       # اندازه ورودی مرحله اول (کل فریم)
+    "roi_padding": 0.25,                           # حاشیه برش نسبت به بزرگ‌ترین ضلع bucket
+    "adaptive_imgsz": None,                        # اندازه ورودی بر اساس فاز، مثلاً {"idle": 320, "active": 640, "discharge": 1024}
 
     # --- آستانه‌های باکت (Bucket Thresholds) ---
     "bucket_area_threshold": 165000,                # آستانه ورود به فاز تخلیه (برحسب پیکسل)
@@ -15,21 +26,59 @@ config = {
 
     # --- آستانه تغییرات تصویر (Motion Detection) ---
     "motion_threshold": 20,                        # حداقل تغییرات تصویر برای فعال بودن ماشین (قابل تنظیم)
+    "motion_width": 160,                           # عرض تصویر کوچک‌شده برای محاسبه حرکت (پیکسل)
+    "motion_roi": None,                            # ناحیه محاسبه حرکت (x1, y1, x2, y2) به نسبت؛ None = کل تصویر
+    "idle_delay_sec": 5.0,                         # بعد از این مدت بدون حرکت، شاول پارک (idle) فرض می‌شود
+    "idle_infer_interval_sec": 2.0,                # فاصله اجرای YOLO وقتی شاول پارک است (ثانیه)
+    "active_infer_interval_sec": 0.0,              # فاصله اجرای YOLO هنگام حرکت؛ 0 = همه فریم‌ها
 
     # --- سایر تنظیمات پردازش ---
     "enable_day": True,                            # فعال بودن پردازش برای تصاویر روز
     "enable_night": False,                         # فعال بودن پردازش برای تصاویر شب
+    "detect_interval": 1,                          # اجرای YOLO هر N فریم؛ بین آن‌ها باکس‌ها ردیابی می‌شوند (1 = همه فریم‌ها)
     "draw_boxes": False,                            # نمایش باکس دور اشیا در تصویر
+    "vid_stride": 1,                               # فقط هر N فریم دوربین decode می‌شود (بقیه فقط grab)
+    "decode_skip_when_busy": True,                 # وقتی پردازش فریم قبلی را برنداشته، فریم جدید فقط grab شود
+    "frame_ring_slots": 6,                         # تعداد بافرهای ازپیش‌تخصیص‌یافته فریم (حداقل ۵)
+    "process_pipeline": False,                     # Capture / inference / UI در پردازه‌های جدا (فریم‌ها در shared memory)
+    "process_affinity": {"capture": None, "inference": None, "ui": None},   # هسته‌های CPU هر پردازه، مثلاً [0]
+    "process_torch_threads": {"capture": 1, "inference": None, "ui": 1},    # torch.set_num_threads هر پردازه؛ None = پیش‌فرض
 
     # --- تنظیمات ظاهری و عمومی ---
     "fps": 30,                                     # نرخ نمایش فریم (پیشنهادی، برحسب میلی‌ثانیه)
     "language": "fa",                              # زبان برنامه (fa/en) - قابل توسعه
+    "metrics_host": "127.0.0.1",                   # آدرس سرور وضعیت/metrics در headless.py؛ 0.0.0.0 برای دسترسی از شبکه
+    "metrics_port": 8085,                          # پورت سرور وضعیت/metrics
+    "metrics_unix_socket": None,                   # مسیر Unix socket به جای TCP (اختیاری)
+    "latency_dump_path": "logs/latency.json",      # فایل آمار زمان مراحل (p50/p95/p99) - دکمه نمایش لاگ
+    "latency_dump_interval_sec": 60,               # فاصله ذخیره خودکار آمار زمان مراحل
 
     # --- تنظیمات ذخیره تصویر ---
     "capture_enabled": True,  # فعال بودن ذخیره تصویر
     "capture_interval_sec": 30,  # هر چند ثانیه یک‌بار (هنگام فعال بودن ماشین)
     "capture_image_width": 1920,  # 1920  1280
     "capture_image_height": 1080,  # 1080 720
+    "capture_queue_size": 8,  # حداکثر عکس‌های در صف نوشتن (در صورت پر شدن قدیمی‌ترین حذف می‌شود)
+    "capture_write_batch": 4,  # تعداد عکس‌هایی که هر بار با هم encode و نوشته می‌شوند
+    "capture_archive": False,  # به جای یک فایل JPEG برای هر عکس، append در chunk های روزانه (.cap) همراه motion/وضعیت/دت‌ها
+    "capture_archive_chunk_mb": 256,  # حداکثر اندازه‌ی هر chunk؛ بعد از آن chunk بعدی شروع می‌شود
+
+    # --- پایگاه داده‌ی رویدادها ---
+    "event_db_enabled": True,  # ثبت همه‌ی چرخه‌های تخلیه و مرجع عکس‌ها در SQLite
+    "event_db_path": "logs/events.db",
+    "event_db_queue_size": 10000,  # حداکثر ردیف‌های در صف نوشتن (در صورت عقب ماندن دیسک قدیمی‌ترین حذف می‌شود)
+    "log_thumb_width": 160,  # عرض تصاویر کوچک پنجره‌ی لاگ
+    "log_thumb_cache_mb": 64,  # سقف حافظه‌ی cache تصاویر کوچک (LRU)
+    "log_thumb_workers": 2,  # نخ‌های decode تصاویر کوچک
+
+    # --- کلیپ ویدیویی قبل/بعد از هشدار ---
+    "clip_enabled": False,  # نگه داشتن چند ثانیه‌ی اخیر (JPEG در حافظه) و ذخیره MP4 هنگام هشدار
+    "clip_trigger": "alert",  # alert = فقط هشدار کمبود دندان، cycle = همه‌ی تخلیه‌های کامل
+    "clip_pre_sec": 10.0,  # ثانیه‌های قبل از رویداد
+    "clip_post_sec": 5.0,  # ثانیه‌های بعد از رویداد
+    "clip_width": 960,  # عرض فریم‌های کلیپ (کوچک‌تر = حافظه و CPU کمتر)
+    "clip_jpeg_quality": 80,  # کیفیت JPEG فریم‌های داخل حافظه
+    "clip_max_mb": 64,  # سقف حافظه‌ی فریم‌های فشرده (مگابایت)
 
 
 }
@@ -1,6 +1,11 @@
 # core/bucket_monitor.py
 
 import time
+import numpy as np
+
+STATUS_CHECKING = "بررسی سیستم"
+STATUS_OK = "سلامت سیستم"
+STATUS_ALERT = "هشدار: تعداد دندان‌ها کم است!"
 
 class BucketMonitor:
     def __init__(self, config):
@@ -9,9 +14,10 @@ class BucketMonitor:
         self.discharge_start_time = None
         self.discharge_start_frame = None
         self.max_teeth_count = 0
-        self.last_status = "بررسی سیستم"
+        self.last_status = STATUS_CHECKING
         self.current_frame_num = 0
         self._event_msg = ""  # پیام لحظه‌ای وسط
+        self.last_cycle = None  # خلاصه آخرین چرخه تخلیه‌ی تمام‌شده
 
     def reset_discharge(self):
         self.in_discharge = False
@@ -19,23 +25,26 @@ class BucketMonitor:
         self.discharge_start_frame = None
         self.max_teeth_count = 0
 
-    def update(self, bucket_area, teeth_areas, motion_change):
+    def update(self, bucket_area, teeth_areas, motion_change, timestamp=None):
+        # timestamp: زمان فریم (مثلاً زمان داخل ویدیو در حالت replay)؛ None = ساعت سیستم
+        now = time.time() if timestamp is None else timestamp
         self.current_frame_num += 1
+        cycle = None
 
         if not self.in_discharge:
             if bucket_area > self.config["bucket_area_threshold"]:
                 self.in_discharge = True
-                self.discharge_start_time = time.time()
+                self.discharge_start_time = now
                 self.discharge_start_frame = self.current_frame_num
                 self.max_teeth_count = 0
                 self._event_msg = "فاز بارگیری و تخلیه"
         else:
-            teeth_count = sum([area > self.config["tooth_area_threshold"] for area in teeth_areas])
+            teeth_count = int(np.count_nonzero(np.asarray(teeth_areas) > self.config["tooth_area_threshold"]))
             if teeth_count > self.max_teeth_count:
                 self.max_teeth_count = teeth_count
 
             if bucket_area < self.config["bucket_area_exit_threshold"]:
-                discharge_time = time.time() - self.discharge_start_time
+                discharge_time = now - self.discharge_start_time
                 discharge_frames = self.current_frame_num - self.discharge_start_frame
 
                 time_ok = discharge_time >= self.config["bucket_min_discharge_time"]
@@ -43,16 +52,35 @@ class BucketMonitor:
 
                 if (time_ok or frame_ok):
                     if self.max_teeth_count < self.config["tooth_min_count"]:
-                        self.last_status = "هشدار: تعداد دندان‌ها کم است!"
+                        self.last_status = STATUS_ALERT
                         self._event_msg = "تخلیه کامل"
                     else:
-                        self.last_status = "سلامت سیستم"
+                        self.last_status = STATUS_OK
                         self._event_msg = "تخلیه کامل"
                 else:
                     # وضعیت سیستم تغییر نمی‌کند، فقط یک پیام کوتاه می‌دهیم
                     self._event_msg = "تخلیه ناقص"
 
+                cycle = {
+                    "start": self.discharge_start_time,
+                    "end": now,
+                    "duration": discharge_time,
+                    "frames": discharge_frames,
+                    "max_teeth": self.max_teeth_count,
+                    "complete": time_ok or frame_ok,
+                    "alert": (time_ok or frame_ok) and self.max_teeth_count < self.config["tooth_min_count"],
+                    "status": self.last_status,
+                }
+                self.last_cycle = cycle
                 self.reset_discharge()
+        return cycle
+
+    def update_from_dets(self, dets, motion_change, timestamp=None):
+        # dets آرایه‌ی ساخت‌یافته است؛ مساحت bucket = آخرین (مطمئن‌ترین) bucket
+        bucket_areas = dets["area"][dets["class"] == "bucket"]
+        bucket_area = int(bucket_areas[-1]) if len(bucket_areas) else 0
+        teeth_areas = dets["area"][dets["class"] == "teeth"]
+        return self.update(bucket_area, teeth_areas, motion_change, timestamp)
 
     def get_status(self):
         return self.last_status
@@ -62,3 +90,94 @@ class BucketMonitor:
 
     def clear_event(self):
         self._event_msg = ""
+
+
+# ---- نسخه‌ی برداری برای جاروب آستانه‌ها (نتیجه‌ی یکسان با BucketMonitor) ----
+
+def discharge_segments(bucket_area, enter_threshold, exit_threshold):
+    """اندیس فریم ورود و خروج هر چرخه تخلیه (هیسترزیس ورود/خروج مثل BucketMonitor.update).
+    حلقه فقط روی چرخه‌هاست، نه روی فریم‌ها. خروجی: (starts, ends, open_start)"""
+    bucket_area = np.asarray(bucket_area)
+    above = np.flatnonzero(bucket_area > enter_threshold)
+    below = np.flatnonzero(bucket_area < exit_threshold)
+    starts, ends = [], []
+    pos = 0
+    open_start = None   # چرخه‌ای که تا پایان داده‌ها تمام نشده
+    while True:
+        k = np.searchsorted(above, pos)
+        if k == len(above):
+            break
+        start = above[k]
+        j = np.searchsorted(below, start + 1)   # فریم ورود، خروج را بررسی نمی‌کند
+        if j == len(below):
+            open_start = int(start)
+            break
+        starts.append(start)
+        ends.append(below[j])
+        pos = below[j] + 1
+    return np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64), open_start
+
+
+def segment_max(values, starts, ends):
+    """بیشینه‌ی values در بازه‌های [start + 1, end] (فریم ورود دندان‌ها را نمی‌شمارد)."""
+    if not len(starts):
+        return np.zeros(0, dtype=np.int64)
+    padded = np.append(np.asarray(values, dtype=np.int64), 0)
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2] = starts + 1
+    bounds[1::2] = ends + 1
+    return np.maximum.reduceat(padded, bounds)[0::2]
+
+
+def evaluate_segments(starts, ends, max_teeth, timestamps, config):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    duration = timestamps[ends] - timestamps[starts]
+    frames = ends - starts
+    complete = (duration >= config["bucket_min_discharge_time"]) | (frames >= config["bucket_min_discharge_frames"])
+    alert = complete & (max_teeth < config["tooth_min_count"])
+    done = np.flatnonzero(complete)
+    if len(done):
+        status = STATUS_ALERT if alert[done[-1]] else STATUS_OK
+    else:
+        status = STATUS_CHECKING
+    return {
+        "start": starts, "end": ends,
+        "start_time": timestamps[starts], "end_time": timestamps[ends],
+        "duration": duration, "frames": frames, "max_teeth": max_teeth,
+        "complete": complete, "alert": alert, "status": status,
+    }
+
+
+def simulate(bucket_area, teeth_counts, timestamps, config):
+    """معادل برداری اجرای BucketMonitor روی کل داده‌ها با یک config.
+    teeth_counts: تعداد دندان‌های بزرگ‌تر از tooth_area_threshold در هر فریم."""
+    starts, ends, open_start = discharge_segments(
+        bucket_area, config["bucket_area_threshold"], config["bucket_area_exit_threshold"]
+    )
+    result = evaluate_segments(starts, ends, segment_max(teeth_counts, starts, ends), timestamps, config)
+    result["open_start"] = open_start
+    return result
+
+
+def sweep(bucket_area, teeth_counts, timestamps, configs):
+    """اجرای هم‌زمان چندین config؛ چرخه‌ها فقط یک‌بار برای هر جفت آستانه ورود/خروج
+    و بیشینه دندان‌ها یک‌بار برای هر آستانه دندان محاسبه می‌شوند.
+    teeth_counts: آرایه (برای همه‌ی config ها) یا dict از tooth_area_threshold به آرایه."""
+    segments = {}
+    maxima = {}
+    results = []
+    for config in configs:
+        key = (config["bucket_area_threshold"], config["bucket_area_exit_threshold"])
+        if key not in segments:
+            segments[key] = discharge_segments(bucket_area, *key)
+        starts, ends, open_start = segments[key]
+
+        tooth_key = config["tooth_area_threshold"] if isinstance(teeth_counts, dict) else None
+        if (key, tooth_key) not in maxima:
+            counts = teeth_counts[tooth_key] if tooth_key is not None else teeth_counts
+            maxima[key, tooth_key] = segment_max(counts, starts, ends)
+
+        result = evaluate_segments(starts, ends, maxima[key, tooth_key], timestamps, config)
+        result["open_start"] = open_start
+        results.append(result)
+    return results
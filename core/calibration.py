@@ -0,0 +1,161 @@
+# core/calibration.py
+import csv
+import itertools
+import os
+import numpy as np
+from core.bucket_monitor import sweep
+from core.detection_cache import DetectionCache
+
+PARAMS = (
+    "bucket_area_threshold", "bucket_area_exit_threshold", "tooth_area_threshold", "tooth_min_count",
+    "bucket_min_discharge_time", "bucket_min_discharge_frames",
+)
+DURATION_PARAMS = ("bucket_min_discharge_time", "bucket_min_discharge_frames")
+
+
+def load_ground_truth(path):
+    """فایل CSV با ستون‌های video,time,type (type: discharge یا missing_tooth؛ time برحسب ثانیه ویدیو).
+    ردیف نامعتبر ValueError با نام فایل و شماره خط می‌دهد."""
+    truth = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            video = os.path.basename(row["video"])
+            kinds = truth.setdefault(video, {"discharge": [], "missing_tooth": []})
+            kind = (row["type"] or "").strip()
+            if kind not in kinds:
+                raise ValueError(f"{path}:{reader.line_num}: unknown event type {kind!r} "
+                                 f"(expected one of {', '.join(kinds)})")
+            try:
+                kinds[kind].append(float(row["time"]))
+            except (TypeError, ValueError):
+                raise ValueError(f"{path}:{reader.line_num}: invalid time {row['time']!r}") from None
+    return {video: {k: np.sort(v) for k, v in kinds.items()} for video, kinds in truth.items()}
+
+
+class CalibrationData:
+    """آرایه‌های لازم برای جاروب آستانه‌ها از کش دت‌های یک ویدیو."""
+
+    def __init__(self, cache_path):
+        cache = DetectionCache(cache_path)
+        self.video = os.path.basename(cache.meta.get("video", cache_path))
+        self.bucket_area = cache.bucket_areas()
+        self.teeth_frames, self.teeth_areas = cache.teeth()
+        self.timestamps = np.asarray(cache.frame["time"], dtype=np.float64)
+        self.num_frames = cache.num_frames
+        self.counts = {}
+
+    def teeth_counts(self, threshold):
+        if threshold not in self.counts:
+            frames = self.teeth_frames[self.teeth_areas > threshold]
+            self.counts[threshold] = np.bincount(frames, minlength=self.num_frames)
+        return self.counts[threshold]
+
+
+def match(times, starts, ends, tolerance):
+    """تعداد رویدادهای واقعی که داخل یک بازه‌ی پیش‌بینی‌شده (± tolerance) هستند و تعداد بازه‌های درست."""
+    if not len(times) or not len(starts):
+        return 0, 0
+    lo = np.searchsorted(times, starts - tolerance, side="left")
+    hi = np.searchsorted(times, ends + tolerance, side="right")
+    hit_predictions = int(np.count_nonzero(hi > lo))
+    covered = np.zeros(len(times) + 1, dtype=np.int64)
+    np.add.at(covered, lo, 1)
+    np.add.at(covered, hi, -1)
+    hit_truth = int(np.count_nonzero(np.cumsum(covered)[:-1] > 0))
+    return hit_truth, hit_predictions
+
+
+def f1(tp_truth, n_truth, tp_pred, n_pred):
+    precision = tp_pred / n_pred if n_pred else (1.0 if not n_truth else 0.0)
+    recall = tp_truth / n_truth if n_truth else 1.0
+    score = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, score
+
+
+def score_configs(datasets, truth, configs, tolerance=2.0):
+    """برای هر config دقت/بازخوانی هشدارها و تشخیص تخلیه روی همه‌ی ویدیوها."""
+    totals = np.zeros((len(configs), 8))   # alert: tp_t, n_t, tp_p, n_p | discharge: همان چهار
+    for data in datasets:
+        gt = truth.get(data.video, {"discharge": np.zeros(0), "missing_tooth": np.zeros(0)})
+        counts = {c["tooth_area_threshold"]: data.teeth_counts(c["tooth_area_threshold"]) for c in configs}
+        for i, result in enumerate(sweep(data.bucket_area, counts, data.timestamps, configs)):
+            alert, complete = result["alert"], result["complete"]
+            for offset, mask, times in ((0, alert, gt["missing_tooth"]), (4, complete, gt["discharge"])):
+                starts, ends = result["start_time"][mask], result["end_time"][mask]
+                tp_truth, tp_pred = match(times, starts, ends, tolerance)
+                totals[i, offset:offset + 4] += (tp_truth, len(times), tp_pred, len(starts))
+
+    rows = []
+    for config, t in zip(configs, totals):
+        precision, recall, score = f1(*t[:4])
+        d_precision, d_recall, d_score = f1(*t[4:])
+        rows.append(dict(
+            {p: config[p] for p in PARAMS},
+            precision=float(precision), recall=float(recall), f1=float(score),
+            discharge_precision=float(d_precision), discharge_recall=float(d_recall), discharge_f1=float(d_score),
+        ))
+    rows.sort(key=lambda r: (r["f1"], r["discharge_f1"], r["recall"]), reverse=True)
+    return rows
+
+
+def grid(base, values):
+    configs = []
+    for combo in itertools.product(*(values[p] for p in PARAMS)):
+        config = dict(base, **dict(zip(PARAMS, combo)))
+        if config["bucket_area_exit_threshold"] <= config["bucket_area_threshold"]:
+            configs.append(config)
+    return configs
+
+
+def coarse_values(datasets, base, steps=8):
+    """مقادیر اولیه از صدک‌های داده (مساحت bucket های غیرصفر و مساحت دندان‌ها)."""
+    buckets = np.concatenate([d.bucket_area[d.bucket_area > 0] for d in datasets] or [np.zeros(0)])
+    teeth = np.concatenate([d.teeth_areas for d in datasets] or [np.zeros(0)])
+    q = np.linspace(10, 95, steps)
+
+    def candidates(data, key):
+        values = np.percentile(data, q) if len(data) else np.zeros(0)
+        return sorted({int(v) for v in values} | {int(base[key])})
+
+    return {
+        "bucket_area_threshold": candidates(buckets, "bucket_area_threshold"),
+        "bucket_area_exit_threshold": candidates(buckets, "bucket_area_exit_threshold"),
+        "tooth_area_threshold": candidates(teeth, "tooth_area_threshold"),
+        "tooth_min_count": sorted(set(range(1, 9)) | {int(base["tooth_min_count"])}),
+        # حداقل مدت تخلیه فقط در مرحله‌ی ریز شدن جستجو می‌شود
+        "bucket_min_discharge_time": [base["bucket_min_discharge_time"] * k for k in (0.5, 1, 2)],
+        "bucket_min_discharge_frames": [int(base["bucket_min_discharge_frames"] * k) for k in (0.5, 1, 2)],
+    }
+
+
+def refine_values(best, values):
+    """اطراف بهترین config: بهترین مقدار و نقطه‌ی وسط تا هر همسایه در شبکه قبلی."""
+    refined = {}
+    for p in PARAMS:
+        grid_values = values[p]
+        i = grid_values.index(best[p])
+        lo = grid_values[max(i - 1, 0)]
+        hi = grid_values[min(i + 1, len(grid_values) - 1)]
+        points = ((lo + best[p]) / 2, best[p], (best[p] + hi) / 2)
+        if p == "bucket_min_discharge_time":
+            refined[p] = sorted({round(v, 2) for v in points})
+        else:
+            refined[p] = sorted({int(round(v)) for v in points})
+    return refined
+
+
+def calibrate(datasets, truth, base, tolerance=2.0, rounds=3, keep=5):
+    """جستجوی درشت روی شبکه و بعد چند دور ریزتر شدن اطراف بهترین‌ها."""
+    values = coarse_values(datasets, base)
+    coarse = dict(values, **{p: [base[p]] for p in DURATION_PARAMS})
+    ranked = score_configs(datasets, truth, grid(base, coarse), tolerance)
+    seen = {tuple(r[p] for p in PARAMS): r for r in ranked}
+    for _ in range(rounds):
+        for best in ranked[:keep]:
+            configs = [c for c in grid(base, refine_values(best, values)) if tuple(c[p] for p in PARAMS) not in seen]
+            for row in score_configs(datasets, truth, configs, tolerance):
+                seen[tuple(row[p] for p in PARAMS)] = row
+        values = {p: sorted({r[p] for r in seen.values()}) for p in PARAMS}
+        ranked = sorted(seen.values(), key=lambda r: (r["f1"], r["discharge_f1"], r["recall"]), reverse=True)
+    return ranked
@@ -1,57 +1,117 @@
 import cv2
-import os
 import time
 import threading
-from datetime import datetime
+from collections import deque
 from core.yolo_processor import YoloProcessor
+from core.frame_ring import FrameRing
+from core.motion import MotionEstimator, MotionGate
+from core.tracker import BoxTracker
+from core.capture_writer import capture_writer_from_config
+from core.event_store import event_store_from_config
+from core.bucket_monitor import BucketMonitor
+from core.clip_recorder import clip_recorder_from_config, clip_reason
+from core.latency import latency
 from config import config
-from core.utils import is_day
+from core.utils import is_day, empty_dets
 
 class CameraHandler:
-    def __init__(self):
-        self.cap = cv2.VideoCapture(config["input_source"])
-        self.yolo = YoloProcessor()
-        self.latest_frame = None         # آخرین فریم دریافتی
-        self.latest_result = (None, [])  # (processed_frame, dets)
+    def __init__(self, source=None, start_processing=True):
+        # با start_processing=False فقط Capture اجرا می‌شود (مثلاً وقتی InferenceScheduler مدل مشترک دارد)
+        self.source = config["input_source"] if source is None else source
+        self.cap = cv2.VideoCapture(self.source)
+        self.yolo = YoloProcessor() if start_processing else None
+        self.ring = FrameRing(config.get("frame_ring_slots", 6))  # بافرهای فریم بدون کپی
+        self.display_slots = deque()     # خانه‌هایی که فریمشان هنوز در دست UI است
+        self.latest_result = (None, empty_dets(), None)  # (processed_frame, dets, meta)
+        self.dets_source = (-1, 0.0)     # (seq، زمان Capture) فریمی که آخرین دت‌ها از آن آمده‌اند
         self.latest_motion = 0
+        self.motion = MotionEstimator(config.get("motion_width", 160), config.get("motion_roi"))
+        self.gate = MotionGate(config)   # تصمیم اجرای YOLO بر اساس فاز idle / active / discharge
+        self.monitor = BucketMonitor(config)   # با هر نتیجه‌ی پردازش (نه با تایمر UI) جلو می‌رود
+        self.in_discharge = False        # توسط مانیتور سطل تنظیم می‌شود
+        self.listeners = []              # callback(meta) با هر نتیجه‌ی جدید (مثلاً سیگنال Qt)
+        self.last_dets = empty_dets()
+        self.tracker = BoxTracker()      # پیش‌بینی باکس‌ها بین keyframe ها
+        self.frames_since_detect = 0
         self.last_capture_time = 0       # زمان آخرین ذخیره عکس
+        self.decoded = 0                 # فریم‌های کامل decode شده (retrieve)
+        self.skipped = 0                 # فریم‌هایی که فقط grab شدند
+        self.events = event_store_from_config(config, self.source)   # چرخه‌ها و مرجع عکس‌ها در SQLite
+        self.capture_writer = capture_writer_from_config(config, self.events.add_capture if self.events else None,
+                                                           self.source)
+        self.clip_recorder = clip_recorder_from_config(config, self.source)   # کلیپ قبل/بعد از هشدار (اختیاری)
         self.running = True
         self.lock = threading.Lock()     # برای thread-safe بودن
 
+        # timer های هر نخ (هیستوگرام‌ها در latency مشترک‌اند)
+        self.t_grab = latency.timer("grab")
+        self.t_decode = latency.timer("decode")
+        self.t_motion = latency.timer("motion")
+        self.t_is_day = latency.timer("is_day")
+        self.t_monitor = latency.timer("monitor")
+
         # ---- نخ جداگانه برای Capture و ذخیره عکس
         self.capture_thread = threading.Thread(target=self.capture_frames, daemon=True)
         self.processing_thread = threading.Thread(target=self.process_frames, daemon=True)
         self.capture_thread.start()
-        self.processing_thread.start()
+        if start_processing:
+            self.processing_thread.start()
 
     def capture_frames(self):
-        prev_gray = None
-
         # خواندن FPS ویدیو (اگر نداشت ۳۰ فرض کن)
         fps = self.cap.get(cv2.CAP_PROP_FPS)
         if fps <= 1 or fps > 120:  # اگر ویدیوی تو weird بود
             fps = 30
         frame_duration = 1.0 / fps
+        vid_stride = max(int(config.get("vid_stride", 1)), 1)
+        skip_when_busy = config.get("decode_skip_when_busy", True)
+        index = 0
+        gap = 1                          # فریم‌های دوربین از آخرین فریم decode شده (برای نرمال کردن motion)
 
         while self.running:
             start_time = time.time()
 
-            ret, frame = self.cap.read()
+            # مثل LoadStreams: فریم‌هایی که کسی نمی‌بیند فقط grab می‌شوند (بدون decode کامل و تبدیل BGR)؛
+            # retrieve فقط وقتی پردازش فریم قبلی را برداشته و خانه‌ی آزاد هست
+            index += 1
+            slot = None
+            if index % vid_stride == 0 and not (skip_when_busy and self.ring.pending()):
+                slot = self.ring.acquire_write()
+            if slot is None and (index % vid_stride != 0 or skip_when_busy):
+                with self.t_grab:
+                    grabbed = self.cap.grab()
+                if grabbed:
+                    self.skipped += 1
+                    gap += 1
+                    latency.count("decode_skipped")
+                else:
+                    time.sleep(0.02)
+                sleep_time = frame_duration - (time.time() - start_time)
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+                continue
+
+            with self.t_decode:
+                if slot is not None:
+                    ret, frame = self.cap.read(slot.buffer)
+                else:
+                    ret, frame = self.cap.read()
             if ret:
-                # محاسبه motion و ... (کدهای خودت)
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                motion_change = 0
-                if prev_gray is not None:
-                    diff = cv2.absdiff(gray, prev_gray)
-                    motion_change = diff.mean()
-                prev_gray = gray
+                captured = time.monotonic()   # زمان Capture برای اندازه‌گیری تأخیر تا نمایش
+                self.decoded += 1
+                latency.count("frames_decoded")
+                # محاسبه motion روی تصویر کوچک‌شده، به ازای یک فریم دوربین (مستقل از تعداد فریم‌های skip شده)
+                with self.t_motion:
+                    motion_change = self.motion.update(frame, gap)
+                gap = 1
 
                 with self.lock:
-                    self.latest_frame = frame.copy()
                     self.latest_motion = motion_change
-
-                self.save_capture_if_needed(frame, motion_change)
+                if slot is not None:
+                    self.ring.commit(slot, frame, captured)
             else:
+                if slot is not None:
+                    self.ring.abort(slot)
                 time.sleep(0.02)
 
             # توقف برای هماهنگ شدن با سرعت ویدیوی واقعی
@@ -62,58 +122,153 @@ class CameraHandler:
 
     def process_frames(self):
         while self.running:
-            # فقط آخرین فریم را بردار (thread-safe)
-            with self.lock:
-                frame = self.latest_frame.copy() if self.latest_frame is not None else None
-                motion_change = self.latest_motion
-
-            if frame is None:
+            # فقط آخرین فریم را قرض بگیر (بدون کپی)
+            slot = self.ring.borrow_latest()
+            if slot is None:
                 time.sleep(0.02)
                 continue
+            frame = slot.buffer
+
+            # وقتی شاول پارک است YOLO اجرا نمی‌شود و آخرین نتیجه نگه داشته می‌شود
+            now = time.time()
+            phase = self.gate.update(self.get_last_motion(), self.in_discharge, now)
+            self.yolo.set_phase(phase)
+            if not self.gate.should_infer(now):
+                # فقط overlay قبلی نمایش داده می‌شود؛ مانیتور با دت‌های کهنه جلو نمی‌رود
+                self.publish_result(slot, self.last_dets, update_monitor=False)
+                time.sleep(config.get("fps", 30)/1000.0)
+                continue
 
             # تشخیص روز/شب
-            is_daytime = is_day(frame)
+            with self.t_is_day:
+                is_daytime = is_day(frame)
             process_flag = (
                 (is_daytime and config["enable_day"]) or
                 (not is_daytime and config["enable_night"])
             )
 
-            if process_flag:
-                processed_frame, dets = self.yolo.process_with_dets(frame)
+            # YOLO فقط روی keyframe ها؛ بین آن‌ها باکس‌ها با ردیاب جلو می‌روند
+            detect_interval = max(int(config.get("detect_interval", 1)), 1)
+            if process_flag and detect_interval > 1 and 0 < self.frames_since_detect < detect_interval:
+                processed_frame, dets = frame, self.tracker.predict()
+                self.frames_since_detect += 1
+            elif process_flag:
+                latency.record("frame_age", time.monotonic() - slot.timestamp)  # از Capture تا شروع inference
+                processed_frame, dets = frame, self.yolo.detect(frame)
+                if detect_interval > 1:
+                    dets = self.tracker.update(dets)
+                self.frames_since_detect = 1
+                self.dets_source = (slot.seq, slot.timestamp)
             else:
-                processed_frame, dets = frame, []
+                processed_frame, dets = frame, empty_dets()
+                self.tracker.reset()
+                self.frames_since_detect = 0
+                self.dets_source = (slot.seq, slot.timestamp)
 
             # نتیجه پردازش را برای UI ذخیره کن
-            self.latest_result = (processed_frame, dets)
+            self.last_dets = dets
+            self.publish_result(slot, dets)
 
             time.sleep(config.get("fps", 30)/1000.0)
 
+    def publish_result(self, slot, dets, update_monitor=True):
+        """مانیتور سطل را با دت‌های این فریم جلو می‌برد و فریم و دت‌ها را همراه شناسه و زمان Capture فریم،
+        فریم منبع دت‌ها و وضعیت/پیام مانیتور منتشر می‌کند؛ بعد به listener ها خبر می‌دهد.
+        update_monitor=False برای فریم‌هایی که gate از inference رد کرده (dets همان نتیجه‌ی قبلی است)."""
+        cycle = None
+        if update_monitor:
+            with self.t_monitor:
+                cycle = self.monitor.update_from_dets(dets, self.get_last_motion())
+        self.in_discharge = self.monitor.in_discharge
+        if cycle is not None and self.events is not None:
+            self.events.add_cycle(cycle)
+        # ذخیره عکس بعد از پردازش تا وضعیت و دت‌ها هم کنار آن ثبت شوند؛ خانه هنوز در دست همین نخ است
+        self.save_capture_if_needed(slot.buffer, self.get_last_motion(), dets)
+        if self.clip_recorder is not None:
+            self.clip_recorder.submit(slot.buffer, time.time())
+            reason = clip_reason(cycle, config)
+            if reason:
+                self.clip_recorder.trigger(reason)
+        event = self.monitor.get_event()
+        if event:
+            self.monitor.clear_event()
+        processed = time.monotonic()
+        latency.record("capture_to_result", processed - slot.timestamp)
+        meta = {
+            "seq": slot.seq,
+            "captured": slot.timestamp,
+            "processed": processed,
+            "dets_seq": self.dets_source[0],
+            "dets_captured": self.dets_source[1],
+            "status": self.monitor.get_status(),
+            "event": event,
+            "cycle": cycle,
+        }
+        self.latest_result = (slot.buffer, dets, meta)
+        self.publish_slot(slot)
+        for callback in self.listeners:
+            callback(meta)
+
+    def add_listener(self, callback):
+        """callback(meta) از نخ پردازش صدا زده می‌شود؛ باید سریع باشد (مثلاً emit یک سیگنال Qt)."""
+        self.listeners.append(callback)
+
+    def publish_slot(self, slot):
+        # فریم نمایش داده‌شده روی همان خانه است؛ دو نتیجه‌ی آخر نگه داشته می‌شوند
+        # تا UI در حال تبدیل فریم قبلی، بافرش بازنویسی نشود
+        self.display_slots.append(slot)
+        while len(self.display_slots) > 2:
+            self.ring.release(self.display_slots.popleft())
+
     def get_processed_frame_with_dets(self):
+        return self.latest_result[:2]
+
+    def get_latest(self):
+        """(frame, dets, meta)؛ meta شامل seq و زمان Capture فریم، فریم منبع دت‌ها و وضعیت مانیتور (یا None)."""
         return self.latest_result
 
     def get_last_motion(self):
         with self.lock:
             return self.latest_motion
 
-    def save_capture_if_needed(self, frame, motion_change):
+    def set_discharge(self, in_discharge):
+        self.in_discharge = in_discharge
+
+    def get_phase(self):
+        return self.gate.phase
+
+    def save_capture_if_needed(self, frame, motion_change, dets=None):
         if not config.get("capture_enabled", False):
             return
         if motion_change > config.get("motion_threshold", 20):
             now = time.time()
             interval = config.get("capture_interval_sec", 10)
             if now - self.last_capture_time >= interval:
-                today = datetime.now().strftime("%Y-%m-%d")
-                log_dir = os.path.join("logs", today, "captures")
-                os.makedirs(log_dir, exist_ok=True)
-                timestamp = datetime.now().strftime("%H-%M-%S")
                 img_w = config.get("capture_image_width", 640)
                 img_h = config.get("capture_image_height", 480)
-                frame_resized = cv2.resize(frame, (img_w, img_h))
-                filename = os.path.join(log_dir, f"capture_{timestamp}.jpg")
-                cv2.imwrite(filename, frame_resized)
+                # resize / encode / نوشتن در نخ CaptureWriter انجام می‌شود
+                self.capture_writer.submit(frame, now, (img_w, img_h), motion_change, self.monitor.get_status(), dets)
                 self.last_capture_time = now
 
+    def get_capture_stats(self):
+        return self.capture_writer.stats()
+
+    def get_decode_stats(self):
+        total = self.decoded + self.skipped
+        return {"decoded": self.decoded, "skipped": self.skipped,
+                "skip_ratio": self.skipped / total if total else 0.0}
+
+    def stop(self):
+        self.running = False
+        self.capture_writer.stop()
+        if self.events is not None:
+            self.events.stop()
+        if self.clip_recorder is not None:
+            self.clip_recorder.stop()
+
     def __del__(self):
         self.running = False
+        if hasattr(self, "capture_writer"):
+            self.capture_writer.stop()
         if hasattr(self, "cap"):
             self.cap.release()
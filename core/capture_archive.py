@@ -0,0 +1,207 @@
+# core/capture_archive.py
+import glob
+import json
+import os
+import struct
+from datetime import datetime
+import cv2
+import numpy as np
+
+# قالب فایل chunk:
+#   MAGIC | رکورد* | اندیس (time, offset)* | TRAILER
+#   رکورد: REC (magic, timestamp, طول meta, طول jpeg) + meta (JSON) + jpeg
+# اندیس فقط هنگام بستن chunk نوشته می‌شود؛ chunk بدون اندیس (قطع برق) با پیمایش رکوردها خوانده می‌شود.
+MAGIC = b"SHVCAP01"
+REC = struct.Struct("<4sdII")
+REC_MAGIC = b"CREC"
+TRAILER = struct.Struct("<QI4s")
+TRAILER_MAGIC = b"CIDX"
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("offset", "<u8")])
+CHUNK_SUFFIX = ".cap"
+
+
+class CaptureArchiveWriter:
+    """نوشتن عکس‌های encode شده به صورت append در فایل‌های chunk روزانه (logs/<date>/captures/*.cap)
+    به جای یک فایل برای هر عکس. با عوض شدن روز یا رسیدن به max_bytes، chunk بسته و بعدی باز می‌شود."""
+
+    def __init__(self, root="logs", max_bytes=256 << 20, prefix="chunk_"):
+        self.root = root
+        self.prefix = prefix   # با چند دوربین شامل شناسه‌ی دوربین (هر writer chunk های خودش)
+        self.max_bytes = max_bytes
+        self.file = None
+        self.day = None
+        self.index = []
+
+    def open_chunk(self, timestamp):
+        now = datetime.fromtimestamp(timestamp)
+        self.day = now.strftime("%Y-%m-%d")
+        path = os.path.join(self.root, self.day, "captures")
+        os.makedirs(path, exist_ok=True)
+        name = os.path.join(path, f"{self.prefix}{now:%H-%M-%S}{CHUNK_SUFFIX}")
+        while os.path.exists(name):   # دو chunk در یک ثانیه (مثلاً اجرای دوباره برنامه)
+            name = name[:-len(CHUNK_SUFFIX)] + "_" + CHUNK_SUFFIX
+        self.file = open(name, "wb")
+        self.file.write(MAGIC)
+        self.index = []
+
+    def append(self, timestamp, jpeg, meta=None):
+        """(مسیر chunk، آفست رکورد) برای ارجاع به عکس از بیرون"""
+        day = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+        if self.file is not None and (day != self.day or self.file.tell() >= self.max_bytes):
+            self.close()
+        if self.file is None:
+            self.open_chunk(timestamp)
+        meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode()
+        data = memoryview(jpeg).cast("B")
+        offset = self.file.tell()
+        try:
+            self.file.write(REC.pack(REC_MAGIC, timestamp, len(meta_bytes), len(data)))
+            self.file.write(meta_bytes)
+            self.file.write(data)
+        except OSError:
+            # رکورد نیمه‌کاره حذف شود تا رکوردهای بعدی (و پیمایش بدون اندیس) سالم بمانند
+            self.file.seek(offset)
+            self.file.truncate()
+            raise
+        self.index.append((timestamp, offset))   # فقط بعد از نوشتن کامل رکورد
+        return self.file.name, offset
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        """نوشتن اندیس (زمان، آفست) مرتب‌شده بر اساس زمان و trailer در انتهای chunk."""
+        if self.file is None:
+            return
+        index = np.array(self.index, dtype=INDEX_DTYPE)
+        index.sort(order="time", kind="stable")
+        offset = self.file.tell()
+        self.file.write(index.tobytes())
+        self.file.write(TRAILER.pack(offset, len(index), TRAILER_MAGIC))
+        self.file.close()
+        self.file = None
+
+
+class CaptureChunk:
+    """خواندن یک chunk با memmap؛ دسترسی تصادفی بر اساس زمان از طریق اندیس."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"not a capture chunk: {path}")
+        self.index = self.read_index()
+
+    def read_index(self):
+        if len(self.data) >= len(MAGIC) + TRAILER.size:
+            offset, count, magic = TRAILER.unpack(bytes(self.data[-TRAILER.size:]))
+            if magic == TRAILER_MAGIC and offset + count * INDEX_DTYPE.itemsize == len(self.data) - TRAILER.size:
+                return np.frombuffer(self.data, dtype=INDEX_DTYPE, count=count, offset=offset)
+        return self.scan()
+
+    def scan(self):
+        """بازسازی اندیس از روی رکوردها (chunk ناتمام)؛ رکورد ناقص آخر نادیده گرفته می‌شود."""
+        entries = []
+        offset, end = len(MAGIC), len(self.data)
+        while offset + REC.size <= end:
+            magic, timestamp, meta_len, data_len = REC.unpack(bytes(self.data[offset:offset + REC.size]))
+            if magic != REC_MAGIC or offset + REC.size + meta_len + data_len > end:
+                break
+            entries.append((timestamp, offset))
+            offset += REC.size + meta_len + data_len
+        index = np.array(entries, dtype=INDEX_DTYPE)
+        index.sort(order="time", kind="stable")
+        return index
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def times(self):
+        return self.index["time"]
+
+    def record(self, i):
+        """(meta، jpeg) رکورد i ام به ترتیب زمان؛ jpeg نمایی از memmap است (بدون کپی)."""
+        offset = int(self.index["offset"][i])
+        _, _, meta_len, data_len = REC.unpack(bytes(self.data[offset:offset + REC.size]))
+        start = offset + REC.size
+        meta = json.loads(bytes(self.data[start:start + meta_len]))
+        return meta, self.data[start + meta_len:start + meta_len + data_len]
+
+    def image(self, i, flags=cv2.IMREAD_COLOR):
+        return cv2.imdecode(self.record(i)[1], flags)
+
+    def find(self, timestamp):
+        """نزدیک‌ترین رکورد به زمان داده‌شده (یا -1 برای chunk خالی)."""
+        if not len(self.index):
+            return -1
+        i = int(np.searchsorted(self.times, timestamp))
+        if i == len(self.index) or (i > 0 and timestamp - self.times[i - 1] < self.times[i] - timestamp):
+            i -= 1
+        return i
+
+    def between(self, start, end):
+        """شماره رکوردهای بازه‌ی زمانی [start, end]."""
+        lo = int(np.searchsorted(self.times, start, side="left"))
+        hi = int(np.searchsorted(self.times, end, side="right"))
+        return range(lo, hi)
+
+
+def read_jpeg(path, offset=None):
+    """بایت‌های JPEG یک عکس: رکورد آرشیو در آفست داده‌شده یا فایل JPEG جدا (offset=None)."""
+    with open(path, "rb") as f:
+        if offset is None:
+            return np.frombuffer(f.read(), dtype=np.uint8)
+        f.seek(offset)
+        magic, _, meta_len, data_len = REC.unpack(f.read(REC.size))
+        if magic != REC_MAGIC:
+            raise ValueError(f"no capture record at {path}@{offset}")
+        f.seek(meta_len, os.SEEK_CUR)
+        return np.frombuffer(f.read(data_len), dtype=np.uint8)
+
+
+def chunk_paths(path):
+    """فایل‌های chunk یک مسیر: خود فایل، پوشه‌ی captures یک روز، پوشه‌ی روز یا ریشه‌ی logs."""
+    if os.path.isfile(path):
+        return [path]
+    patterns = ("*" + CHUNK_SUFFIX, os.path.join("captures", "*" + CHUNK_SUFFIX),
+                os.path.join("*", "captures", "*" + CHUNK_SUFFIX))
+    for pattern in patterns:
+        found = sorted(glob.glob(os.path.join(path, pattern)))
+        if found:
+            return found
+    return []
+
+
+def export_jpegs(chunk, out_dir, indices=None, with_meta=True):
+    """تبدیل رکوردها به فایل‌های JPEG (بدون encode دوباره) و meta هر عکس به JSON کنار آن، برای برچسب‌زنی."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    for i in (range(len(chunk)) if indices is None else indices):
+        meta, jpeg = chunk.record(i)
+        timestamp = float(chunk.times[i])
+        name = f"capture_{datetime.fromtimestamp(timestamp):%Y-%m-%d_%H-%M-%S}_{int(timestamp * 1000) % 1000:03d}"
+        with open(os.path.join(out_dir, name + ".jpg"), "wb") as f:
+            f.write(jpeg)
+        if with_meta:
+            with open(os.path.join(out_dir, name + ".json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+        written += 1
+    return written
+
+
+def capture_meta(frame_shape, size, motion, status, dets):
+    """meta هر رکورد؛ باکس‌ها به مختصات عکس ذخیره‌شده (size) برده می‌شوند تا برای برچسب‌زنی مستقیم قابل استفاده باشند."""
+    h, w = frame_shape[:2]
+    sx, sy = size[0] / w, size[1] / h
+    objects = []
+    for det in (dets if dets is not None else ()):
+        x1, y1, x2, y2 = (int(v) for v in det["bbox"])
+        objects.append({
+            "class": str(det["class"]),
+            "bbox": [round(x1 * sx), round(y1 * sy), round(x2 * sx), round(y2 * sy)],
+            "conf": round(float(det["conf"]), 4),
+        })
+    return {"motion": round(float(motion), 3), "status": status, "size": list(size),
+            "frame_size": [w, h], "dets": objects}
@@ -0,0 +1,145 @@
+# core/capture_writer.py
+import cv2
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from core.latency import latency
+from core.capture_archive import CaptureArchiveWriter, capture_meta
+from core.utils import source_tag
+
+
+class CaptureWriter:
+    """نوشتن عکس‌های دوره‌ای در پس‌زمینه: resize و encode و نوشتن روی دیسک
+    در نخ جداگانه، با صف محدود که در صورت پر شدن قدیمی‌ترین عکس را دور می‌ریزد.
+    با archive_max_bytes عکس‌ها به جای فایل‌های جدا در chunk های روزانه‌ی CaptureArchiveWriter نوشته می‌شوند.
+    on_written(timestamp, path, offset, meta) بعد از نوشتن هر عکس در همین نخ صدا زده می‌شود.
+    با source، شناسه‌ی دوربین در نام فایل می‌آید تا writer های چند دوربین (InferenceScheduler) روی هم ننویسند."""
+
+    def __init__(self, max_queue=8, batch_size=4, root="logs", archive_max_bytes=None, on_written=None, source=None):
+        self.max_queue = max_queue
+        tag = "" if source is None else source_tag(source) + "_"
+        self.prefix = f"capture_{tag}"
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.root = root
+        self.archive = CaptureArchiveWriter(root, archive_max_bytes, f"chunk_{tag}") if archive_max_bytes else None
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.dir_cache = {}      # تاریخ -> مسیر پوشه‌ی captures (ساخته‌شده)
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self.last_error = None
+        self.running = True
+        self.t_submit = latency.timer("capture_submit")
+        self.t_encode = latency.timer("capture_encode")
+        self.t_write = latency.timer("capture_write")
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, timestamp, size, motion=0.0, status=None, dets=None):
+        """فریم کپی می‌شود (بافر آن متعلق به حلقه‌ی فریم است) و بقیه کارها در نخ writer انجام می‌شود.
+        motion / status / dets در حالت archive کنار عکس ذخیره و به on_written داده می‌شوند."""
+        with self.t_submit:
+            meta = capture_meta(frame.shape, size, motion, status, dets)
+            item = (frame.copy(), timestamp, size, meta)
+            with self.cond:
+                if len(self.queue) >= self.max_queue:
+                    self.queue.popleft()
+                    self.dropped += 1
+                    latency.count("capture_dropped")
+                self.queue.append(item)
+                self.cond.notify()
+
+    def capture_dir(self, day):
+        path = self.dir_cache.get(day)
+        if path is None:
+            path = os.path.join(self.root, day, "captures")
+            os.makedirs(path, exist_ok=True)
+            self.dir_cache = {day: path}   # فقط روز جاری نگه داشته می‌شود
+        return path
+
+    def encode(self, frame, timestamp, size, meta):
+        if frame.shape[1::-1] != tuple(size):
+            frame = cv2.resize(frame, tuple(size))
+        ok, buf = cv2.imencode(".jpg", frame)
+        if not ok:
+            return None
+        if self.archive is not None:
+            return timestamp, buf, meta, None
+        now = datetime.fromtimestamp(timestamp)
+        filename = os.path.join(self.capture_dir(now.strftime("%Y-%m-%d")), f"{self.prefix}{now:%H-%M-%S}_{int(timestamp * 1000) % 1000:03d}.jpg")
+        return timestamp, buf, meta, filename
+
+    def run(self):
+        while self.running:
+            with self.cond:
+                while not self.queue and self.running:
+                    self.cond.wait(0.5)
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+
+            # اول همه encode می‌شوند، بعد نوشتن‌ها پشت سر هم انجام می‌شود
+            encoded = []
+            for item in batch:
+                with self.t_encode:
+                    try:
+                        encoded.append(self.encode(*item))
+                    except OSError as e:   # ساخت پوشه (دیسک پر / دسترسی)
+                        self.error(e)
+            for result in encoded:
+                if result is None:
+                    continue
+                timestamp, buf, meta, filename = result
+                try:
+                    with self.t_write:
+                        if self.archive is not None:
+                            filename, offset = self.archive.append(timestamp, buf, meta)
+                        else:
+                            offset = None
+                            with open(filename, "wb") as f:
+                                f.write(buf)
+                except OSError as e:
+                    self.error(e)
+                    continue
+                self.written += 1
+                if self.on_written is not None:
+                    self.on_written(timestamp, filename, offset, meta)
+            if self.archive is not None and encoded:
+                try:
+                    self.archive.flush()   # بعد از قطع برق فقط رکوردهای همین batch از دست می‌روند
+                except OSError as e:
+                    self.error(e)
+        if self.archive is not None:
+            try:
+                self.archive.close()       # نوشتن اندیس انتهای chunk
+            except OSError as e:
+                self.error(e)
+
+    def error(self, e):
+        """خطای دیسک نخ writer را متوقف نمی‌کند؛ فقط شمرده و آخرین پیام نگه داشته می‌شود."""
+        self.errors += 1
+        self.last_error = str(e)
+        latency.count("capture_errors")
+
+    def stats(self):
+        with self.cond:
+            depth = len(self.queue)
+        return {"queue_depth": depth, "dropped": self.dropped, "written": self.written,
+                "errors": self.errors, "last_error": self.last_error}
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify()
+        if self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+
+def capture_writer_from_config(config, on_written=None, source=None):
+    archive_mb = config.get("capture_archive_chunk_mb", 256) if config.get("capture_archive", False) else None
+    return CaptureWriter(
+        config.get("capture_queue_size", 8), config.get("capture_write_batch", 4),
+        archive_max_bytes=int(archive_mb) << 20 if archive_mb else None, on_written=on_written, source=source,
+    )
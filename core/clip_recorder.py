@@ -0,0 +1,201 @@
+# core/clip_recorder.py
+import cv2
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from core.latency import latency
+from core.utils import source_tag
+
+
+class ClipRecorder:
+    """حلقه‌ی فریم‌های فشرده (JPEG، یک بار encode در نخ جداگانه) از چند ثانیه‌ی اخیر؛ با trigger
+    (مثلاً هشدار کمبود دندان) بعد از گذشت post_sec ثانیه، فریم‌های [trigger - pre_sec, trigger + post_sec]
+    در نخ دیگری به MP4 تبدیل می‌شوند. حافظه با max_bytes و طول صف ورودی محدود است.
+    با stop کلیپ نیمه‌کاره (post-roll ناقص) و کلیپ‌های در صف قبل از بسته شدن نخ‌ها نوشته می‌شوند."""
+
+    def __init__(self, pre_sec=10.0, post_sec=5.0, width=960, quality=80, max_bytes=64 << 20,
+                 max_queue=8, root="logs", source=None):
+        self.pre_sec = pre_sec
+        self.post_sec = post_sec
+        self.width = width
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.max_queue = max_queue
+        self.root = root
+        self.prefix = "clip_" if source is None else f"clip_{source_tag(source)}_"   # چند دوربین روی هم ننویسند
+
+        self.queue = deque()             # (timestamp, frame) منتظر encode
+        self.triggers = deque()          # (timestamp, reason)
+        self.cond = threading.Condition()
+        self.ring = deque()              # (timestamp, jpeg) فقط در نخ encode تغییر می‌کند
+        self.ring_bytes = 0
+        self.active = None               # [شروع، پایان، دلیل] کلیپ در حال جمع شدن
+        self.segments = queue.Queue(maxsize=2)
+        self.dropped = 0                 # فریم‌هایی که به خاطر عقب ماندن encode دور ریخته شدند
+        self.evicted = 0                 # فریم‌هایی که به خاطر سقف حافظه از حلقه حذف شدند
+        self.written = 0
+        self.errors = 0
+        self.last_error = None
+        self.running = True
+        self.t_encode = latency.timer("clip_encode")
+
+        self.encode_thread = threading.Thread(target=self.run, daemon=True)
+        self.write_thread = threading.Thread(target=self.write_segments, daemon=True)
+        self.encode_thread.start()
+        self.write_thread.start()
+
+    def submit(self, frame, timestamp):
+        """فریم کوچک/کپی می‌شود (بافر آن متعلق به حلقه‌ی فریم است)؛ encode در نخ جداگانه."""
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+        with self.cond:
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+                latency.count("clip_dropped")
+            self.queue.append((timestamp, frame))
+            self.cond.notify()
+
+    def trigger(self, reason="alert", timestamp=None):
+        with self.cond:
+            self.triggers.append((time.time() if timestamp is None else timestamp, reason))
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.triggers and self.running:
+                    if not self.cond.wait(0.5):
+                        break
+                batch = list(self.queue)
+                self.queue.clear()
+                triggers = list(self.triggers)
+                self.triggers.clear()
+                running = self.running
+
+            for timestamp, frame in batch:
+                with self.t_encode:
+                    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if ok:
+                    self.ring.append((timestamp, buf))
+                    self.ring_bytes += buf.nbytes
+
+            for timestamp, reason in triggers:
+                if self.active is None:
+                    self.active = [timestamp, timestamp + self.post_sec, reason]
+                else:
+                    # رویداد جدید در حین جمع شدن کلیپ: همان کلیپ طولانی‌تر می‌شود
+                    self.active[1] = max(self.active[1], timestamp + self.post_sec)
+
+            self.trim()
+            newest = self.ring[-1][0] if self.ring else 0
+            # اگر فریمی نرسد (قطع دوربین) بعد از post_sec اضافه با همان فریم‌های موجود نوشته می‌شود؛
+            # هنگام توقف هم کلیپ فعال با فریم‌های موجود نوشته می‌شود
+            if self.active and (not running or newest >= self.active[1] or time.time() > self.active[1] + self.post_sec):
+                self.flush(wait=not running)
+            if not running:
+                break
+        self.segments.put(None)          # پایان نخ نوشتن بعد از کلیپ‌های در صف
+
+    def trim(self):
+        """حذف فریم‌های قدیمی‌تر از پنجره‌ی pre_sec (نسبت به شروع کلیپ فعال یا جدیدترین فریم) و سقف حافظه."""
+        if self.ring:
+            start = self.active[0] if self.active else self.ring[-1][0]
+            while self.ring and self.ring[0][0] < start - self.pre_sec:
+                self.ring_bytes -= self.ring.popleft()[1].nbytes
+        while self.ring_bytes > self.max_bytes:
+            self.ring_bytes -= self.ring.popleft()[1].nbytes
+            self.evicted += 1
+
+    def flush(self, wait=False):
+        start, end, reason = self.active
+        self.active = None
+        frames = [(t, buf) for t, buf in self.ring if start - self.pre_sec <= t <= end]
+        if not frames:
+            return
+        try:
+            self.segments.put((start, reason, frames), block=wait, timeout=5.0)
+        except queue.Full:
+            latency.count("clip_segments_dropped")
+
+    def clip_path(self, start, reason):
+        now = datetime.fromtimestamp(start)
+        path = os.path.join(self.root, now.strftime("%Y-%m-%d"), "clips")
+        os.makedirs(path, exist_ok=True)
+        return os.path.join(path, f"{self.prefix}{now:%H-%M-%S}_{reason}.mp4")
+
+    def write_segments(self):
+        while True:
+            segment = self.segments.get()
+            if segment is None:
+                break
+            try:
+                self.write_segment(*segment)
+            except (OSError, ValueError, cv2.error) as e:
+                self.error(e)   # فقط همین کلیپ از دست می‌رود؛ نخ برای هشدارهای بعدی زنده می‌ماند
+                continue
+            self.written += 1
+
+    def write_segment(self, start, reason, frames):
+        first = cv2.imdecode(frames[0][1], cv2.IMREAD_COLOR)
+        if first is None:
+            raise ValueError("clip frame could not be decoded")
+        duration = frames[-1][0] - frames[0][0]
+        fps = min(max((len(frames) - 1) / duration, 1.0), 60.0) if duration > 0 else 10.0
+        path = self.clip_path(start, reason)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, first.shape[1::-1])
+        if not writer.isOpened():
+            raise OSError(f"cannot open video writer for {path}")
+        try:
+            writer.write(first)
+            for _, buf in frames[1:]:
+                frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+                if frame is not None:
+                    writer.write(frame)
+        finally:
+            writer.release()
+
+    def error(self, e):
+        self.errors += 1
+        self.last_error = str(e)
+        latency.count("clip_errors")
+
+    def stats(self):
+        return {"ring_frames": len(self.ring), "ring_bytes": self.ring_bytes, "dropped": self.dropped,
+                "evicted": self.evicted, "written": self.written, "errors": self.errors, "last_error": self.last_error}
+
+    def stop(self, timeout=10.0):
+        """کلیپ فعال و کلیپ‌های در صف نوشته می‌شوند؛ حداکثر timeout ثانیه منتظر می‌ماند."""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        deadline = time.time() + timeout
+        for thread in (self.encode_thread, self.write_thread):
+            if thread is not threading.current_thread():
+                thread.join(max(deadline - time.time(), 0.0))
+
+
+def clip_recorder_from_config(config, source=None):
+    if not config.get("clip_enabled", False):
+        return None
+    return ClipRecorder(
+        config.get("clip_pre_sec", 10.0), config.get("clip_post_sec", 5.0), config.get("clip_width", 960),
+        config.get("clip_jpeg_quality", 80), int(config.get("clip_max_mb", 64)) << 20, source=source,
+    )
+
+
+def clip_reason(cycle, config):
+    """دلیل ذخیره‌ی کلیپ برای چرخه‌ی تمام‌شده (یا None): فقط هشدارها یا همه‌ی تخلیه‌های کامل."""
+    if cycle is None:
+        return None
+    if cycle["alert"]:
+        return "alert"
+    if config.get("clip_trigger", "alert") == "cycle" and cycle["complete"]:
+        return "cycle"
+    return None
@@ -0,0 +1,142 @@
+# core/detection_cache.py
+import hashlib
+import json
+import os
+import numpy as np
+from core.utils import DET_DTYPE
+
+CLASSES = ("bucket", "teeth")
+
+# ستون‌های ذخیره‌شده: (نام فایل، dtype، شکل هر سطر)
+FRAME_COLUMNS = {"index": (np.int32, ()), "time": (np.float64, ()), "motion": (np.float32, ())}
+DET_COLUMNS = {"frame": (np.int32, ()), "cls": (np.int8, ()), "bbox": (np.int32, (4,)), "conf": (np.float32, ())}
+
+
+def file_digest(path, limit=None):
+    """sha1 محتوای فایل؛ با limit فقط ابتدای فایل خوانده می‌شود (برای ویدیوهای بزرگ)."""
+    h = hashlib.sha1()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return h.hexdigest()
+
+
+def cache_key(video_path, model_path, imgsz, gate=None, params=None):
+    # ویدیو: اندازه + ابتدای فایل (هش کامل ویدیوهای چند گیگابایتی کند است)؛ مدل: هش کامل
+    st = os.stat(video_path)
+    video = f"{st.st_size}:{file_digest(video_path, 4 << 20)}"
+    model = file_digest(model_path)
+    size = "x".join(str(s) for s in np.atleast_1d(imgsz))
+    key = f"{video}|{model}|{size}"
+    if gate:
+        # gate = (مسیر مدل سبک، تنظیمات آن): فریم‌های رد شده در cascade دت ندارند
+        gate_path, *gate_params = gate
+        key += f"|{file_digest(gate_path)}|{gate_params}"
+    if params:
+        # بقیه ورودی‌هایی که خروجی را عوض می‌کنند (vid_stride، روز/شب، آستانه‌های NMS، motion، ...)
+        key += "|" + json.dumps(params, sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+class DetectionCacheWriter:
+    """نوشتن ستونی دت‌ها (append) در فایل‌های خام؛ meta.json فقط در پایان نوشته می‌شود
+    تا کش ناقص هیچ‌وقت معتبر فرض نشود."""
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.meta = dict(meta or {})
+        os.makedirs(path, exist_ok=True)
+        self.files = {}
+        for prefix, columns in (("frame", FRAME_COLUMNS), ("det", DET_COLUMNS)):
+            for name in columns:
+                self.files[f"{prefix}_{name}"] = open(os.path.join(path, f"{prefix}_{name}.bin"), "wb")
+        self.num_frames = 0
+        self.num_dets = 0
+
+    def append(self, index, timestamp, motion, dets):
+        self.files["frame_index"].write(np.int32(index).tobytes())
+        self.files["frame_time"].write(np.float64(timestamp).tobytes())
+        self.files["frame_motion"].write(np.float32(motion).tobytes())
+        if len(dets):
+            n = len(dets)
+            cls = np.where(dets["class"] == "bucket", 0, 1).astype(np.int8)
+            self.files["det_frame"].write(np.full(n, self.num_frames, dtype=np.int32).tobytes())
+            self.files["det_cls"].write(cls.tobytes())
+            self.files["det_bbox"].write(np.ascontiguousarray(dets["bbox"], dtype=np.int32).tobytes())
+            self.files["det_conf"].write(np.ascontiguousarray(dets["conf"], dtype=np.float32).tobytes())
+            self.num_dets += n
+        self.num_frames += 1
+
+    def close(self, complete=True):
+        for f in self.files.values():
+            f.close()
+        if complete:
+            meta = dict(self.meta, num_frames=self.num_frames, num_dets=self.num_dets, classes=CLASSES)
+            with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+
+class DetectionCache:
+    """خواندن کش با memmap؛ ستون‌ها بدون بارگذاری کامل در حافظه در دسترس‌اند."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.num_frames = self.meta["num_frames"]
+        self.num_dets = self.meta["num_dets"]
+        self.frame = {name: self._column(f"frame_{name}", dtype, shape, self.num_frames)
+                      for name, (dtype, shape) in FRAME_COLUMNS.items()}
+        self.det = {name: self._column(f"det_{name}", dtype, shape, self.num_dets)
+                    for name, (dtype, shape) in DET_COLUMNS.items()}
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, "meta.json"))
+
+    def _column(self, name, dtype, shape, n):
+        if n == 0:
+            return np.zeros((0, *shape), dtype=dtype)
+        return np.memmap(os.path.join(self.path, f"{name}.bin"), dtype=dtype, mode="r", shape=(n, *shape))
+
+    def areas(self):
+        bbox = self.det["bbox"]
+        return (bbox[:, 2] - bbox[:, 0]).astype(np.int64) * (bbox[:, 3] - bbox[:, 1])
+
+    def bucket_areas(self):
+        """مساحت bucket هر فریم (مثل update_from_dets: آخرین bucket هر فریم)؛ 0 اگر bucket نبود."""
+        out = np.zeros(self.num_frames, dtype=np.int64)
+        mask = self.det["cls"] == 0
+        frames = np.asarray(self.det["frame"][mask])
+        if len(frames):
+            # آخرین رخداد هر فریم: روی آرایه‌ی معکوس، اولین رخداد
+            _, first = np.unique(frames[::-1], return_index=True)
+            last = len(frames) - 1 - first
+            out[frames[last]] = self.areas()[mask][last]
+        return out
+
+    def teeth(self):
+        """(شماره فریم هر tooth، مساحت‌ها) برای شمارش برداری با آستانه‌های مختلف."""
+        mask = self.det["cls"] == 1
+        return np.asarray(self.det["frame"][mask]), self.areas()[mask]
+
+    def teeth_counts(self, tooth_area_threshold):
+        frames, areas = self.teeth()
+        return np.bincount(frames[areas > tooth_area_threshold], minlength=self.num_frames)
+
+    def frame_dets(self, i):
+        """دت‌های یک فریم به صورت آرایه‌ی ساخت‌یافته (برای replay فریم به فریم)."""
+        start, end = np.searchsorted(self.det["frame"], [i, i + 1])
+        dets = np.zeros(end - start, dtype=DET_DTYPE)
+        dets["class"] = np.asarray(CLASSES)[self.det["cls"][start:end]]
+        dets["bbox"] = self.det["bbox"][start:end]
+        dets["conf"] = self.det["conf"][start:end]
+        bbox = dets["bbox"]
+        dets["area"] = (bbox[:, 2] - bbox[:, 0]).astype(np.int64) * (bbox[:, 3] - bbox[:, 1])
+        return dets
@@ -0,0 +1,229 @@
+# core/event_store.py
+import os
+import sqlite3
+import threading
+from collections import deque
+from core.latency import latency
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    duration REAL,
+    frames INTEGER,
+    max_teeth INTEGER,
+    complete INTEGER,
+    alert INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS cycles_end ON cycles(end);
+CREATE INDEX IF NOT EXISTS cycles_alert_end ON cycles(alert, end);
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    source TEXT,
+    time REAL NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER,
+    motion REAL,
+    status TEXT,
+    dets INTEGER
+);
+CREATE INDEX IF NOT EXISTS captures_time ON captures(time);
+"""
+CYCLE_COLUMNS = ("id", "source", "start", "end", "duration", "frames", "max_teeth", "complete", "alert", "status")
+CAPTURE_COLUMNS = ("id", "source", "time", "path", "offset", "motion", "status", "dets")
+
+
+class EventStore:
+    """ذخیره‌ی چرخه‌های تخلیه و مرجع عکس‌های ذخیره‌شده در SQLite (WAL) با اندیس روی زمان.
+    add_* فقط به صف اضافه می‌کند و نوشتن به صورت batch (یک تراکنش) در نخ جداگانه انجام می‌شود،
+    پس نخ پردازش هیچ‌وقت منتظر دیسک نمی‌ماند. عکس‌های هر چرخه با بازه‌ی زمانی آن پیدا می‌شوند
+    (عکس ممکن است بعد از ثبت چرخه نوشته شود). خواندن از هر نخ با اتصال جداگانه‌ی همان نخ است.
+    صف محدود است (max_queue)؛ اگر نوشتن عقب بماند قدیمی‌ترین ردیف‌ها دور ریخته و شمرده می‌شوند."""
+
+    def __init__(self, path="logs/events.db", source=None, batch_size=64, flush_sec=1.0, max_queue=10000):
+        self.path = path
+        self.source = None if source is None else str(source)
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.max_queue = max_queue
+        self.queue = deque()             # (جدول، ردیف)
+        self.cond = threading.Condition()
+        self.local = threading.local()   # اتصال خواندن هر نخ
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.running = True
+        self.thread = None               # نخ نوشتن با اولین add ساخته می‌شود (UI فقط می‌خواند)
+        self.t_write = latency.timer("event_db_write")
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        conn = self.connect()   # with روی اتصال sqlite فقط تراکنش است و اتصال را نمی‌بندد
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------- نوشتن ----------
+    def add_cycle(self, cycle):
+        self.put("cycles", (
+            self.source, cycle["start"], cycle["end"], cycle["duration"], cycle["frames"],
+            cycle["max_teeth"], int(cycle["complete"]), int(cycle["alert"]), cycle["status"],
+        ))
+
+    def add_capture(self, timestamp, path, offset=None, meta=None):
+        meta = meta or {}
+        self.put("captures", (
+            self.source, timestamp, path, offset, meta.get("motion"), meta.get("status"), len(meta.get("dets", ())),
+        ))
+
+    def put(self, table, row):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+            if len(self.queue) >= self.max_queue:
+                self.queue.popleft()
+                self.dropped += 1
+                latency.count("events_dropped")
+            self.queue.append((table, row))
+            if len(self.queue) >= self.batch_size:
+                self.cond.notify()
+
+    def run(self):
+        conn = self.connect()
+        while True:
+            with self.cond:
+                if self.running and len(self.queue) < self.batch_size:
+                    self.cond.wait(self.flush_sec)
+                batch = list(self.queue)
+                self.queue.clear()
+                running = self.running
+            if batch:
+                try:
+                    with self.t_write:
+                        self.write(conn, batch)
+                except sqlite3.Error as e:   # دیسک پر، خطای I/O، database is locked (چند دوربین روی یک فایل)
+                    self.error(e, len(batch))
+            if not running:
+                break
+        conn.close()
+
+    def write(self, conn, batch):
+        cycles = [row for table, row in batch if table == "cycles"]
+        captures = [row for table, row in batch if table == "captures"]
+        with conn:   # یک تراکنش برای کل batch
+            if cycles:
+                conn.executemany(
+                    f"INSERT INTO cycles ({', '.join(CYCLE_COLUMNS[1:])}) VALUES ({', '.join('?' * 9)})", cycles
+                )
+            if captures:
+                conn.executemany(
+                    f"INSERT INTO captures ({', '.join(CAPTURE_COLUMNS[1:])}) VALUES ({', '.join('?' * 7)})", captures
+                )
+        self.written += len(batch)
+
+    def error(self, e, lost):
+        """خطای پایگاه داده نخ نوشتن را متوقف نمی‌کند؛ ردیف‌های همان batch از دست می‌روند و شمرده می‌شوند."""
+        self.errors += 1
+        self.last_error = str(e)
+        latency.count("events_write_failed")
+        latency.count("events_lost", lost)
+
+    # ---------- خواندن ----------
+    def reader(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        return conn
+
+    @staticmethod
+    def cycle_filter(since=None, until=None, alerts_only=False, source=None, until_id=None):
+        clauses, params = [], []
+        if alerts_only:
+            clauses.append("alert = 1")
+        if since is not None:
+            clauses.append("end >= ?")
+            params.append(since)
+        if until is not None and until_id is not None:
+            clauses.append("(end, id) < (?, ?)")   # چرخه‌های هم‌زمان (end برابر) در مرز صفحه جا نمی‌افتند
+            params += [until, until_id]
+        elif until is not None:
+            clauses.append("end < ?")
+            params.append(until)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(str(source))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def cycles(self, since=None, until=None, alerts_only=False, source=None, limit=500, until_id=None):
+        """جدیدترین چرخه‌ها اول؛ برای صفحه‌ی بعد until و until_id = end و id آخرین ردیف (keyset روی (end, id))."""
+        where, params = self.cycle_filter(since, until, alerts_only, source, until_id)
+        rows = self.reader().execute(
+            f"SELECT {', '.join(CYCLE_COLUMNS)} FROM cycles{where} ORDER BY end DESC, id DESC LIMIT ?", params + [limit]
+        ).fetchall()
+        return [dict(zip(CYCLE_COLUMNS, row)) for row in rows]
+
+    def count_cycles(self, since=None, until=None, alerts_only=False, source=None):
+        where, params = self.cycle_filter(since, until, alerts_only, source)
+        return self.reader().execute(f"SELECT COUNT(*) FROM cycles{where}", params).fetchone()[0]
+
+    @staticmethod
+    def capture_filter(start, end, source=None):
+        sql, params = " WHERE time BETWEEN ? AND ?", [start, end]
+        if source is not None:
+            sql += " AND source = ?"
+            params.append(str(source))
+        return sql, params
+
+    def captures(self, start, end, source=None, limit=1000, newest_first=False, before=None, before_id=None):
+        """عکس‌های بازه‌ی [start, end] به ترتیب زمان (مثلاً عکس‌های یک چرخه)؛
+        با newest_first و before / before_id = زمان و id آخرین ردیف، صفحه‌ی بعد (keyset روی (time, id)) خوانده می‌شود."""
+        where, params = self.capture_filter(start, end, source)
+        if before is not None and before_id is not None:
+            where += " AND (time, id) < (?, ?)"   # عکس‌های هم‌زمان (چند دوربین) در مرز صفحه جا نمی‌افتند
+            params += [before, before_id]
+        elif before is not None:
+            where += " AND time < ?"
+            params.append(before)
+        order = "DESC" if newest_first else "ASC"
+        rows = self.reader().execute(
+            f"SELECT {', '.join(CAPTURE_COLUMNS)} FROM captures{where} ORDER BY time {order}, id {order} LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return [dict(zip(CAPTURE_COLUMNS, row)) for row in rows]
+
+    def count_captures(self, start, end, source=None):
+        where, params = self.capture_filter(start, end, source)
+        return self.reader().execute(f"SELECT COUNT(*) FROM captures{where}", params).fetchone()[0]
+
+    def stats(self):
+        with self.cond:
+            depth = len(self.queue)
+        return {"queue_depth": depth, "written": self.written, "dropped": self.dropped,
+                "errors": self.errors, "last_error": self.last_error}
+
+    def stop(self):
+        """نوشتن باقیمانده‌ی صف و بستن نخ نوشتن."""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+
+
+def event_store_from_config(config, source=None):
+    if not config.get("event_db_enabled", True):
+        return None
+    return EventStore(config.get("event_db_path", "logs/events.db"), source,
+                      max_queue=config.get("event_db_queue_size", 10000))
@@ -0,0 +1,80 @@
+# core/frame_ring.py
+import threading
+from core.latency import latency
+
+# وضعیت هر خانه از حلقه
+FREE, WRITING, READY, BORROWED = 0, 1, 2, 3
+
+
+class FrameSlot:
+    __slots__ = ("index", "buffer", "seq", "timestamp", "state")
+
+    def __init__(self, index):
+        self.index = index
+        self.buffer = None   # آرایه از پیش تخصیص‌یافته (بعد از اولین فریم)
+        self.seq = -1        # شماره ترتیبی فریم داخل این خانه
+        self.timestamp = 0.0 # زمان Capture (time.monotonic)
+        self.state = FREE
+
+
+class FrameRing:
+    """حلقه‌ی ثابت از بافرهای فریم؛ Capture مستقیم داخل خانه‌ی آزاد decode می‌کند
+    و پردازش همان بافر را بدون کپی قرض می‌گیرد."""
+
+    def __init__(self, num_slots=6):
+        # حداقل: یک خانه در حال نوشتن، یک فریم آماده، یک فریم در پردازش، دو فریم در نمایش
+        self.slots = [FrameSlot(i) for i in range(max(num_slots, 5))]
+        self.lock = threading.Lock()
+        self.latest = None       # آخرین خانه‌ی آماده (هنوز مصرف نشده)
+        self.next_seq = 0
+        self.dropped = 0         # فریم‌هایی که قبل از مصرف با فریم جدیدتر جایگزین شدند
+
+    def acquire_write(self):
+        """یک خانه‌ی آزاد برای نوشتن برمی‌گرداند (یا None اگر همه مشغول باشند)."""
+        with self.lock:
+            for slot in self.slots:
+                if slot.state == FREE:
+                    slot.state = WRITING
+                    return slot
+        return None
+
+    def commit(self, slot, frame, timestamp=0.0):
+        """فریم نوشته‌شده را منتشر می‌کند؛ اگر decoder آرایه‌ی جدید داده باشد
+        (اولین فریم یا تغییر رزولوشن) همان آرایه بافر این خانه می‌شود."""
+        with self.lock:
+            if frame is not slot.buffer:
+                slot.buffer = frame
+            slot.seq = self.next_seq
+            slot.timestamp = timestamp
+            self.next_seq += 1
+            slot.state = READY
+            previous = self.latest
+            if previous is not None and previous.state == READY:
+                previous.state = FREE
+                self.dropped += 1
+                latency.count("frames_dropped")
+            self.latest = slot
+            return slot.seq
+
+    def pending(self):
+        """آیا فریم آماده‌ای هست که هنوز هیچ مصرف‌کننده‌ای برنداشته؟"""
+        with self.lock:
+            return self.latest is not None
+
+    def abort(self, slot):
+        with self.lock:
+            slot.state = FREE
+
+    def borrow_latest(self):
+        """مالکیت آخرین فریم آماده را به مصرف‌کننده می‌دهد؛ تا release نشود بازنویسی نمی‌شود."""
+        with self.lock:
+            slot = self.latest
+            if slot is None:
+                return None
+            slot.state = BORROWED
+            self.latest = None
+            return slot
+
+    def release(self, slot):
+        with self.lock:
+            slot.state = FREE
@@ -0,0 +1,80 @@
+# core/inference_scheduler.py
+import time
+import threading
+from core.camera_handler import CameraHandler
+from core.yolo_processor import YoloProcessor
+from core.utils import is_day, empty_dets
+from core.latency import latency
+from config import config
+
+
+class InferenceScheduler:
+    """یک مدل مشترک برای چند دوربین: آخرین فریم هر دوربین جمع می‌شود،
+    در یک batch اجرا می‌شود و نتیجه‌ی هر تصویر به BucketMonitor همان دوربین (داخل CameraHandler) می‌رسد."""
+
+    def __init__(self, sources=None):
+        sources = sources or config.get("input_sources") or [config["input_source"]]
+        self.yolo = YoloProcessor()
+        self.cameras = [CameraHandler(source, start_processing=False) for source in sources]
+        self.batch_sizes = []            # اندازه batch های اخیر (برای بررسی کارایی)
+        self.running = True
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def collect(self):
+        """فریم‌های جدید دوربین‌هایی که باید پردازش شوند را قرض می‌گیرد."""
+        now = time.time()
+        ready = []
+        for i, camera in enumerate(self.cameras):
+            slot = camera.ring.borrow_latest()
+            if slot is None:
+                continue
+            frame = slot.buffer
+            camera.gate.update(camera.get_last_motion(), camera.in_discharge, now)
+            is_daytime = is_day(frame)
+            process_flag = (
+                (is_daytime and config["enable_day"]) or
+                (not is_daytime and config["enable_night"])
+            )
+            if process_flag and camera.gate.should_infer(now):
+                ready.append((i, slot))
+                camera.dets_source = (slot.seq, slot.timestamp)
+                latency.record("frame_age", time.monotonic() - slot.timestamp)
+            else:
+                if not process_flag:
+                    camera.dets_source = (slot.seq, slot.timestamp)
+                dets = camera.last_dets if process_flag else empty_dets()
+                # فریم رد شده توسط gate: دت‌های قبلی فقط نمایش داده می‌شوند و مانیتور را جلو نمی‌برند
+                self.route(i, slot, dets, update_monitor=not process_flag)
+        return ready
+
+    def route(self, i, slot, dets, update_monitor=True):
+        camera = self.cameras[i]
+        camera.last_dets = dets
+        camera.publish_result(slot, dets, update_monitor)
+
+    def run(self):
+        while self.running:
+            ready = self.collect()
+            if not ready:
+                time.sleep(0.01)
+                continue
+
+            # بزرگ‌ترین اندازه‌ی لازم بین دوربین‌های این batch
+            sizes = [self.yolo.adaptive_imgsz.get(self.cameras[i].gate.phase) for i, _ in ready]
+            sizes = [size for size in sizes if size]
+            if sizes:
+                self.yolo.set_imgsz(max(sizes))
+            results = self.yolo.process_batch([slot.buffer for _, slot in ready])
+            self.batch_sizes = (self.batch_sizes + [len(ready)])[-100:]
+            for (i, slot), dets in zip(ready, results):
+                self.route(i, slot, dets)
+
+    def get_status(self, i):
+        return self.cameras[i].monitor.get_status()
+
+    def stop(self):
+        self.running = False
+        for camera in self.cameras:
+            camera.stop()   # صف عکس‌ها و رویدادها هم نوشته می‌شود
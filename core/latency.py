@@ -0,0 +1,153 @@
+# core/latency.py
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from coreYoloV5.utils.general import Profile
+
+# مرز بازه‌های هیستوگرام: لگاریتمی از ۱۰ میکروثانیه تا ۱۰ ثانیه، ۲۰ بازه در هر دهه (~۱۲٪ دقت)
+EDGES = [10 ** (-5 + i / 20) for i in range(6 * 20 + 1)]
+
+
+class LatencyHistogram:
+    """هیستوگرام زمان یک مرحله؛ چند نخ (مثلاً CameraHandler های InferenceScheduler) ممکن است هم‌زمان
+    در یک مرحله ثبت کنند، پس record و خواندن پشت یک قفل کوتاه (بدون رقابت ~ده‌ها نانوثانیه) انجام می‌شوند."""
+
+    def __init__(self):
+        self.counts = [0] * (len(EDGES) + 1)
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, dt):
+        i = bisect_right(EDGES, dt)
+        with self.lock:
+            self.counts[i] += 1
+            self.total += dt
+            if dt > self.max:
+                self.max = dt
+
+    def summary(self):
+        with self.lock:
+            counts = list(self.counts)
+            total, peak = self.total, self.max
+        n = sum(counts)
+        if not n:
+            return {"count": 0}
+
+        def percentile(q):
+            # حد بالای بازه‌ای که صدک در آن است (تخمین محافظه‌کارانه)
+            target, seen = q * n, 0
+            for i, c in enumerate(counts):
+                seen += c
+                if seen >= target:
+                    return min(EDGES[i], peak) if i < len(EDGES) else peak
+            return peak
+
+        return {
+            "count": n,
+            "mean_ms": total / n * 1000,
+            "p50_ms": percentile(0.50) * 1000,
+            "p95_ms": percentile(0.95) * 1000,
+            "p99_ms": percentile(0.99) * 1000,
+            "max_ms": peak * 1000,
+        }
+
+
+class StageTimer(Profile):
+    """همان Profile (جمع زمان در t و زمان آخرین اجرا در dt)، به‌علاوه ثبت هر اجرا در هیستوگرام مرحله."""
+
+    def __init__(self, histogram, device=None):
+        super().__init__(device=device)
+        self.histogram = histogram
+
+    def __exit__(self, type, value, traceback):
+        super().__exit__(type, value, traceback)
+        self.histogram.record(self.dt)
+
+
+def skip_ratios(counters):
+    """نسبت فریم‌هایی که decode نشدند و فریم‌های decode شده‌ای که هیچ‌وقت نمایش داده نشدند."""
+    ratios = {}
+    for name, skipped, done in (
+        ("decode_skip", "decode_skipped", "frames_decoded"),
+        ("display_skip", "frames_not_displayed", "frames_displayed"),
+    ):
+        total = counters.get(skipped, 0) + counters.get(done, 0)
+        if total:
+            ratios[name] = counters.get(skipped, 0) / total
+    return ratios
+
+
+class LatencyStats:
+    """هیستوگرام زمان هر مرحله‌ی pipeline و شمارنده‌های فریم‌های دور ریخته‌شده."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()   # ساخت هیستوگرام‌ها و شمارنده‌ها از چند نخ
+        self.started = time.time()
+
+    def timer(self, stage, device=None):
+        """یک timer تازه برای مرحله؛ هر نخ timer خودش را نگه می‌دارد (Profile هم‌زمان قابل استفاده نیست)
+        ولی همه‌ی timer های یک مرحله در یک هیستوگرام ثبت می‌شوند."""
+        return StageTimer(self.histogram(stage), device)
+
+    def histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def record(self, stage, dt):
+        """ثبت مستقیم یک مدت (مثلاً تأخیر بین دو نقطه از pipeline که در یک بلوک with نیستند)."""
+        self.histogram(stage).record(dt)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self, remotes=()):
+        """آمار فعلی؛ remotes: snapshot پردازه‌های دیگر (حالت چندپردازه‌ای) که با این یکی ادغام می‌شوند."""
+        with self.lock:
+            histograms = list(self.histograms.items())
+            counters = dict(self.counters)
+        stages = {name: h.summary() for name, h in histograms}
+        for remote in remotes:
+            stages.update(remote["stages"])
+            for name, value in remote["counters"].items():
+                counters[name] = counters.get(name, 0) + value
+        return {
+            "time": time.time(),
+            "uptime_sec": time.time() - self.started,
+            "stages": stages,
+            "counters": counters,
+            "ratios": skip_ratios(counters),
+        }
+
+    def report(self, snap=None):
+        """جدول متنی برای نمایش در UI."""
+        snap = snap or self.snapshot()
+        lines = [f"{'stage':<20}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+        for name, s in sorted(snap["stages"].items()):
+            if not s["count"]:
+                continue
+            lines.append(f"{name:<20}{s['count']:>8}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+                         f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+        if snap["counters"]:
+            lines.append("")
+            lines += [f"{name:<28}{value:>10}" for name, value in sorted(snap["counters"].items())]
+        lines += [f"{name + '_ratio':<28}{value:>10.3f}" for name, value in sorted(snap.get("ratios", {}).items())]
+        return "\n".join(lines)
+
+    def dump(self, path, snap=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snap or self.snapshot(), f, indent=2)
+        return path
+
+
+# یک نمونه برای کل برنامه (مثل config)
+latency = LatencyStats()
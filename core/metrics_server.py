@@ -0,0 +1,146 @@
+# core/metrics_server.py
+import json
+import numbers
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from core.latency import latency
+
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PHASES = ("idle", "active", "discharge")
+STATES = ("checking", "ok", "alert")
+
+
+def format_value(value):
+    """عدد صحیح بدون تغییر و عدد اعشاری با repr (کوتاه‌ترین نمایش دقیق)؛ بی‌نهایت/NaN به شکل OpenMetrics."""
+    if isinstance(value, numbers.Integral):   # bool و int و عدد صحیح numpy
+        return str(int(value))
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def openmetrics(status, snap):
+    """متن OpenMetrics از وضعیت سرویس و آمار زمان مراحل."""
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"# HELP {name} {help_text}")
+        for suffix, labels, value in samples:
+            label_text = "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}" if labels else ""
+            lines.append(f"{name}{suffix}{label_text} {format_value(value)}")
+
+    metric("shovel_up", "gauge", "Service is running.", [("", {}, 1)])
+    metric("shovel_uptime_seconds", "gauge", "Seconds since service start.", [("", {}, status["uptime_sec"])])
+    metric("shovel_status", "stateset", "Bucket health status.",
+           [("", {"shovel_status": s}, int(status["status"] == s)) for s in STATES])
+    metric("shovel_phase", "stateset", "Motion gate phase.",
+           [("", {"shovel_phase": p}, int(status["phase"] == p)) for p in PHASES])
+    metric("shovel_in_discharge", "gauge", "Bucket is in a discharge phase.", [("", {}, int(status["in_discharge"]))])
+    metric("shovel_frames", "counter", "Processed frames seen by the monitor.", [("_total", {}, status["frames"])])
+    metric("shovel_cycles", "counter", "Finished discharge cycles.", [("_total", {}, status["cycles"])])
+    metric("shovel_alerts", "counter", "Discharge cycles with too few teeth.", [("_total", {}, status["alerts"])])
+    last = status["last_cycle"]
+    if last:
+        metric("shovel_last_cycle_max_teeth", "gauge", "Max teeth counted in the last cycle.",
+               [("", {}, last["max_teeth"])])
+        metric("shovel_last_cycle_duration_seconds", "gauge", "Duration of the last cycle.",
+               [("", {}, last["duration"])])
+        metric("shovel_last_cycle_end_seconds", "gauge", "End time of the last cycle (unix).", [("", {}, last["end"])])
+
+    capture = status["capture"]
+    metric("shovel_capture_queue_depth", "gauge", "Captures waiting to be written.", [("", {}, capture["queue_depth"])])
+    metric("shovel_capture_written", "counter", "Captures written to disk.", [("_total", {}, capture["written"])])
+    metric("shovel_capture_dropped", "counter", "Captures dropped on a full queue.", [("_total", {}, capture["dropped"])])
+    metric("shovel_capture_errors", "counter", "Captures lost to disk errors.", [("_total", {}, capture["errors"])])
+
+    samples = []
+    for stage, s in sorted(snap["stages"].items()):
+        if not s["count"]:
+            continue
+        labels = {"stage": stage}
+        for q in ("50", "95", "99"):
+            samples.append(("", dict(labels, quantile=f"0.{q}"), s[f"p{q}_ms"] / 1000))
+        samples.append(("_sum", labels, s["mean_ms"] * s["count"] / 1000))
+        samples.append(("_count", labels, s["count"]))
+    metric("shovel_stage_latency_seconds", "summary", "Per-stage pipeline latency.", samples)
+
+    metric("shovel_pipeline_events", "counter", "Pipeline frame counters (drops, skips, ...).",
+           [("_total", {"event": name}, value) for name, value in sorted(snap["counters"].items())])
+    metric("shovel_skip_ratio", "gauge", "Fraction of frames skipped per kind.",
+           [("", {"kind": name}, value) for name, value in sorted(snap["ratios"].items())])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics (OpenMetrics)، /status، /events?limit=N و /latency (JSON)."""
+
+    service = None   # توسط MetricsServer تنظیم می‌شود
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            body = openmetrics(self.service.status(), latency.snapshot()).encode()
+            self.reply(200, OPENMETRICS_TYPE, body)
+        elif url.path in ("/", "/status"):
+            self.reply_json(self.service.status())
+        elif url.path == "/events":
+            limit = parse_qs(url.query).get("limit", [None])[0]
+            if limit is not None and not (limit.isdecimal() and int(limit) > 0):
+                self.reply(400, "text/plain; charset=utf-8", b"limit must be a positive integer\n")
+                return
+            self.reply_json(self.service.recent_events(int(limit) if limit else None))
+        elif url.path == "/latency":
+            self.reply_json(latency.snapshot())
+        else:
+            self.reply(404, "text/plain; charset=utf-8", b"not found\n")
+
+    def reply_json(self, data):
+        self.reply(200, "application/json; charset=utf-8", json.dumps(data, ensure_ascii=False).encode())
+
+    def reply(self, code, content_type, body):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # روی Unix socket آدرس کلاینت رشته‌ی خالی است
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        pass   # هر scrape لاگ نشود
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """سرور HTTP کوچک (TCP یا Unix socket) در نخ جداگانه برای دسترسی به وضعیت از روی شبکه."""
+
+    def __init__(self, service, host="127.0.0.1", port=8085, unix_path=None):
+        handler = type("Handler", (MetricsHandler,), {"service": service})
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            self.server = UnixHTTPServer(unix_path, handler)
+        else:
+            self.server = ThreadingHTTPServer((host, port), handler)
+        self.unix_path = unix_path
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
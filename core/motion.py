@@ -0,0 +1,81 @@
+# core/motion.py
+import cv2
+
+# فازهای کاری شاول برای تصمیم‌گیری درباره اجرای YOLO
+IDLE, ACTIVE, DISCHARGE = "idle", "active", "discharge"
+
+
+class MotionEstimator:
+    """تخمین ارزان حرکت: absdiff روی نسخه‌ی کوچک‌شده‌ی ناحیه‌ی مورد نظر (ROI).
+    مقدار به ازای یک فریم دوربین است: وقتی بین دو update فریم‌هایی فقط grab شده‌اند (gap > 1)،
+    تغییر بر gap تقسیم می‌شود تا آستانه‌های حرکت با بار inference و نرخ skip جابه‌جا نشوند."""
+
+    def __init__(self, width=160, roi=None):
+        self.width = width
+        self.roi = roi          # (x1, y1, x2, y2) به صورت نسبت از ابعاد تصویر
+        self.small = None
+        self.gray = None
+        self.prev_gray = None
+        self.diff = None
+
+    def _crop(self, frame):
+        if not self.roi:
+            return frame
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = self.roi
+        return frame[int(y1 * h):int(y2 * h), int(x1 * w):int(x2 * w)]
+
+    def update(self, frame, gap=1):
+        """gap: تعداد فریم‌های دوربین از فریم قبلی که به update رسید (فریم‌های فقط grab شده + ۱)."""
+        roi = self._crop(frame)
+        h, w = roi.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        if self.small is None or self.small.shape[1::-1] != size:
+            # تغییر ابعاد ورودی: بافرها از نو ساخته می‌شوند
+            self.small = cv2.resize(roi, size, interpolation=cv2.INTER_AREA)
+            self.gray = cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY)
+            self.prev_gray = self.gray.copy()
+            self.diff = self.gray.copy()
+            return 0.0
+
+        cv2.resize(roi, size, dst=self.small, interpolation=cv2.INTER_AREA)
+        self.prev_gray, self.gray = self.gray, self.prev_gray
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        cv2.absdiff(self.gray, self.prev_gray, dst=self.diff)
+        return float(cv2.mean(self.diff)[0]) / max(gap, 1)
+
+
+class MotionGate:
+    """سیاست اجرای inference بر اساس فاز: در تخلیه همه فریم‌ها، در حرکت با محدودیت،
+    و وقتی شاول پارک است فقط هر چند ثانیه یک‌بار."""
+
+    def __init__(self, config):
+        self.config = config
+        self.phase = ACTIVE
+        self.last_motion_time = 0.0
+        self.last_infer_time = 0.0
+
+    def update(self, motion_change, in_discharge, now):
+        if motion_change > self.config.get("motion_threshold", 20):
+            self.last_motion_time = now
+
+        if in_discharge:
+            self.phase = DISCHARGE
+        elif now - self.last_motion_time < self.config.get("idle_delay_sec", 5.0):
+            self.phase = ACTIVE
+        else:
+            self.phase = IDLE
+        return self.phase
+
+    def should_infer(self, now):
+        if self.phase == DISCHARGE:
+            interval = 0.0
+        elif self.phase == ACTIVE:
+            interval = self.config.get("active_infer_interval_sec", 0.0)
+        else:
+            interval = self.config.get("idle_infer_interval_sec", 2.0)
+
+        if now - self.last_infer_time >= interval:
+            self.last_infer_time = now
+            return True
+        return False
@@ -0,0 +1,401 @@
+# core/process_pipeline.py
+import os
+import time
+import threading
+import multiprocessing as mp
+from collections import deque
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from core.utils import is_day, empty_dets
+from core.latency import latency
+from config import config
+
+# پیام‌های کنترلی روی pipe ها
+STOP, CONFIG = "stop", "config"
+LATENCY = "latency"
+LATENCY_INTERVAL_SEC = 2.0       # فاصله ارسال آمار زمان مراحل پردازه‌های فرزند به UI
+
+
+def setup_process(stage):
+    """هسته‌های مجاز و تعداد نخ‌های torch/OpenCV هر پردازه از config."""
+    cpus = (config.get("process_affinity") or {}).get(stage)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    threads = (config.get("process_torch_threads") or {}).get(stage)
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(threads)
+
+
+def attach_slots(names, shape):
+    """اتصال به خانه‌های shared memory و ساخت آرایه‌ی numpy روی هر کدام (بدون کپی)."""
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    frames = [np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for block in blocks]
+    return blocks, frames
+
+
+def apply_control(conn):
+    """پیام‌های کنترلی دریافتی را اعمال می‌کند؛ False یعنی باید متوقف شد."""
+    while conn.poll():
+        kind, value = conn.recv()
+        if kind == STOP:
+            return False
+        if kind == CONFIG:
+            config.update(value)
+    return True
+
+
+def capture_process(source, num_slots, frames_out, control, releases):
+    """Decode + motion؛ فریم داخل خانه‌ی shared memory نوشته می‌شود
+    و فقط (slot, seq, timestamp, motion) به پردازه‌ی inference فرستاده می‌شود."""
+    from core.motion import MotionEstimator
+    setup_process("capture")
+
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    if fps <= 1 or fps > 120:
+        fps = 30
+    frame_duration = 1.0 / fps
+    motion = MotionEstimator(config.get("motion_width", 160), config.get("motion_roi"))
+    t_grab, t_decode, t_motion = latency.timer("grab"), latency.timer("decode"), latency.timer("motion")
+    last_report = time.time()
+
+    blocks, frames, free = [], [], deque()
+    seq = 0
+    gap = 1                               # فریم‌های دوربین از آخرین فریم decode شده (برای نرمال کردن motion)
+    try:
+        while apply_control(control):
+            start_time = time.time()
+            while not releases.empty():
+                try:
+                    free.append(releases.get_nowait())
+                except Exception:
+                    break
+
+            if start_time - last_report >= LATENCY_INTERVAL_SEC:
+                frames_out.send((LATENCY, "capture", latency.snapshot()))
+                last_report = start_time
+
+            if frames and not free:
+                # همه خانه‌ها در دست مصرف‌کننده‌ها؛ فقط grab تا صف دوربین خالی بماند
+                with t_grab:
+                    grabbed = cap.grab()
+                if grabbed:
+                    gap += 1
+                    latency.count("decode_skipped")
+                else:
+                    time.sleep(0.02)
+                sleep_time = frame_duration - (time.time() - start_time)
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
+                continue
+
+            with t_decode:
+                ret, frame = cap.read(frames[free[0]] if frames else None)
+            if not ret:
+                time.sleep(0.02)
+                continue
+            captured = time.monotonic()       # ساعت monotonic بین پردازه‌ها مشترک است
+            latency.count("frames_decoded")
+
+            if not blocks:
+                # اولین فریم: اندازه معلوم شد، خانه‌ها ساخته و به مصرف‌کننده‌ها معرفی می‌شوند
+                blocks = [shared_memory.SharedMemory(create=True, size=frame.nbytes) for _ in range(num_slots)]
+                frames = [np.ndarray(frame.shape, dtype=np.uint8, buffer=block.buf) for block in blocks]
+                free.extend(range(num_slots))
+                frames_out.send(("init", [block.name for block in blocks], frame.shape))
+
+            index = free.popleft()
+            if frame is not frames[index]:
+                frames[index][:] = frame   # اولین فریم یا decoder در بافر داده‌شده ننوشت
+            frame = frames[index]
+
+            with t_motion:
+                motion_change = motion.update(frame, gap)
+            gap = 1
+
+            frames_out.send((index, seq, captured, motion_change))
+            seq += 1
+
+            sleep_time = frame_duration - (time.time() - start_time)
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+    finally:
+        cap.release()
+        try:
+            frames_out.send((STOP, None))
+        except (BrokenPipeError, OSError):
+            pass
+        frames = frame = None            # آرایه‌های روی بافر باید قبل از close آزاد شوند
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def inference_process(source, frames_in, results_out, control, releases, capture_stats):
+    """فقط آخرین فریم رسیده پردازش می‌شود؛ فریم‌های کهنه بلافاصله به Capture برمی‌گردند.
+    BucketMonitor و ذخیره عکس (همراه وضعیت و دت‌ها) هم همین‌جا با هر نتیجه انجام می‌شوند
+    و (slot, motion, phase, dets, meta) برای UI فرستاده می‌شود."""
+    from core.capture_writer import capture_writer_from_config
+    from core.event_store import event_store_from_config
+    from core.yolo_processor import YoloProcessor
+    from core.motion import MotionGate
+    from core.tracker import BoxTracker
+    from core.bucket_monitor import BucketMonitor
+    setup_process("inference")
+
+    yolo = YoloProcessor()
+    gate = MotionGate(config)
+    tracker = BoxTracker()
+    from core.clip_recorder import clip_recorder_from_config, clip_reason
+    monitor = BucketMonitor(config)
+    clip_recorder = clip_recorder_from_config(config, source)
+    events = event_store_from_config(config, source)
+    writer = capture_writer_from_config(config, events.add_capture if events else None, source)
+    last_capture_time = 0
+    t_monitor = latency.timer("monitor")
+    frames, blocks = None, []
+    last_dets = empty_dets()
+    frames_since_detect = 0
+    dets_source = (-1, 0.0)              # (seq، زمان Capture) فریمی که آخرین دت‌ها از آن آمده‌اند
+    t_is_day = latency.timer("is_day")
+    last_report = time.time()
+
+    while apply_control(control):
+        if time.time() - last_report >= LATENCY_INTERVAL_SEC:
+            results_out.send((LATENCY, "inference", latency.snapshot()))
+            last_report = time.time()
+        if not frames_in.poll(0.02):
+            continue
+        latest, stopped = None, False
+        while frames_in.poll():
+            message = frames_in.recv()
+            if message[0] in ("init", LATENCY):
+                if message[0] == "init":
+                    blocks, frames = attach_slots(message[1], message[2])
+                results_out.send(message)
+            elif message[0] == STOP:
+                results_out.send(message)
+                stopped = True           # Capture تمام شد؛ بستن writer / کلیپ در انتهای تابع
+                break
+            else:
+                if latest is not None:
+                    releases.put(latest[0])
+                    latency.count("frames_dropped")
+                latest = message
+        if stopped:
+            break
+        if latest is None:
+            continue
+
+        index, seq, timestamp, motion_change = latest
+        frame = frames[index]
+        now = time.time()
+        phase = gate.update(motion_change, monitor.in_discharge, now)
+        yolo.set_phase(phase)
+        inferred = gate.should_infer(now)
+        if inferred:
+            with t_is_day:
+                is_daytime = is_day(frame)
+            process_flag = (
+                (is_daytime and config["enable_day"]) or
+                (not is_daytime and config["enable_night"])
+            )
+            detect_interval = max(int(config.get("detect_interval", 1)), 1)
+            if process_flag and detect_interval > 1 and 0 < frames_since_detect < detect_interval:
+                last_dets = tracker.predict()
+                frames_since_detect += 1
+            elif process_flag:
+                latency.record("frame_age", time.monotonic() - timestamp)
+                last_dets = yolo.detect(frame)
+                if detect_interval > 1:
+                    last_dets = tracker.update(last_dets)
+                frames_since_detect = 1
+                dets_source = (seq, timestamp)
+            else:
+                last_dets = empty_dets()
+                tracker.reset()
+                frames_since_detect = 0
+                dets_source = (seq, timestamp)
+
+        cycle = None
+        if inferred:   # فریم رد شده توسط gate: دت‌های قبلی فقط نمایش داده می‌شوند، مانیتور جلو نمی‌رود
+            with t_monitor:
+                cycle = monitor.update_from_dets(last_dets, motion_change)
+        if cycle is not None and events is not None:
+            events.add_cycle(cycle)
+        now = time.time()
+        if config.get("capture_enabled", False) and motion_change > config.get("motion_threshold", 20):
+            if now - last_capture_time >= config.get("capture_interval_sec", 10):
+                size = (config.get("capture_image_width", 640), config.get("capture_image_height", 480))
+                writer.submit(frame, now, size, motion_change, monitor.get_status(), last_dets)
+                last_capture_time = now
+        stats = writer.stats()
+        capture_stats[:] = [stats["queue_depth"], stats["dropped"], stats["written"], stats["errors"]]
+        if clip_recorder is not None:
+            clip_recorder.submit(frame, time.time())
+            reason = clip_reason(cycle, config)
+            if reason:
+                clip_recorder.trigger(reason)
+        event = monitor.get_event()
+        if event:
+            monitor.clear_event()
+        processed = time.monotonic()
+        latency.record("capture_to_result", processed - timestamp)
+        meta = {
+            "seq": seq,
+            "captured": timestamp,
+            "processed": processed,
+            "dets_seq": dets_source[0],
+            "dets_captured": dets_source[1],
+            "status": monitor.get_status(),
+            "event": event,
+            "cycle": cycle,
+        }
+        results_out.send((index, motion_change, phase, last_dets, meta))
+
+    writer.stop()
+    if events is not None:
+        events.stop()
+    if clip_recorder is not None:
+        clip_recorder.stop()
+    frames = frame = None
+    for block in blocks:
+        block.close()
+
+
+class ProcessPipeline:
+    """نسخه‌ی چندپردازه‌ای CameraHandler برای دور زدن GIL: Capture و inference هر کدام پردازه‌ی
+    جدا دارند و UI در پردازه‌ی اصلی می‌ماند. فریم‌ها در خانه‌های shared memory هستند و روی pipe ها
+    فقط توصیف‌گرهای کوچک جابجا می‌شوند. رابط عمومی همان CameraHandler است."""
+
+    def __init__(self, source=None):
+        self.source = config["input_source"] if source is None else source
+        ctx = mp.get_context("spawn")    # fork بعد از بارگذاری torch/Qt امن نیست
+        num_slots = max(config.get("frame_ring_slots", 6), 5)
+
+        frames_recv, frames_send = ctx.Pipe(duplex=False)
+        results_recv, results_send = ctx.Pipe(duplex=False)
+        capture_recv, self.capture_control = ctx.Pipe(duplex=False)
+        inference_recv, self.inference_control = ctx.Pipe(duplex=False)
+        self.results = results_recv
+        self.releases = ctx.Queue()      # شماره خانه‌های آزادشده (از inference و UI به Capture)
+        self.capture_stats = ctx.Array("q", 4, lock=False)
+
+        self.capture = ctx.Process(
+            target=capture_process, daemon=True,
+            args=(self.source, num_slots, frames_send, capture_recv, self.releases),
+        )
+        self.inference = ctx.Process(
+            target=inference_process, daemon=True,
+            args=(self.source, frames_recv, results_send, inference_recv, self.releases, self.capture_stats),
+        )
+        self.capture.start()
+        self.inference.start()
+        setup_process("ui")
+
+        self.blocks, self.frames = [], None
+        self.display_slots = deque()     # خانه‌هایی که فریمشان هنوز در دست UI است
+        self.latest_result = (None, empty_dets(), None)
+        self.latest_motion = 0
+        self.phase = None
+        self.status = None               # وضعیت BucketMonitor (که در پردازه‌ی inference اجرا می‌شود)
+        self.remote_latency = {}         # آخرین آمار زمان مراحل هر پردازه‌ی فرزند
+        self.listeners = []
+        self.running = True
+        self.receiver = threading.Thread(target=self.receive, daemon=True)
+        self.receiver.start()
+
+    def receive(self):
+        """نخ دریافت نتایج: هر نتیجه منتشر می‌شود و listener ها (مثلاً سیگنال Qt) خبردار می‌شوند."""
+        while self.running:
+            try:
+                if not self.results.poll(0.1):
+                    continue
+                message = self.results.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "init":
+                self.blocks, self.frames = attach_slots(message[1], message[2])
+            elif message[0] == LATENCY:
+                self.remote_latency[message[1]] = message[2]
+            elif message[0] == STOP:
+                break
+            else:
+                index, motion_change, phase, dets, meta = message
+                self.latest_result = (self.frames[index], dets, meta)
+                self.latest_motion = motion_change
+                self.phase = phase
+                self.status = meta["status"]
+                # دو نتیجه‌ی آخر نگه داشته می‌شوند تا بافر در حال نمایش بازنویسی نشود
+                self.display_slots.append(index)
+                while len(self.display_slots) > 2:
+                    self.releases.put(self.display_slots.popleft())
+                for callback in self.listeners:
+                    callback(meta)
+
+    def add_listener(self, callback):
+        """callback(meta) از نخ دریافت نتایج صدا زده می‌شود."""
+        self.listeners.append(callback)
+
+    def get_processed_frame_with_dets(self):
+        return self.latest_result[:2]
+
+    def get_latest(self):
+        return self.latest_result
+
+    def get_last_motion(self):
+        return self.latest_motion
+
+    def get_phase(self):
+        return self.phase
+
+    def sync_config(self):
+        """تغییرات تنظیمات (مثلاً از SettingsDialog) به پردازه‌های فرزند فرستاده می‌شود."""
+        values = {k: v for k, v in config.items() if isinstance(v, (bool, int, float, str, type(None)))}
+        for conn in (self.capture_control, self.inference_control):
+            conn.send((CONFIG, values))
+
+    def get_capture_stats(self):
+        queue_depth, dropped, written, errors = self.capture_stats
+        return {"queue_depth": queue_depth, "dropped": dropped, "written": written, "errors": errors}
+
+    def stop(self):
+        self.running = False
+        self.receiver.join(timeout=1)
+        for conn in (self.capture_control, self.inference_control):
+            try:
+                conn.send((STOP, None))
+            except (BrokenPipeError, OSError):
+                pass
+        try:
+            for process in (self.capture, self.inference):
+                process.join(timeout=2)
+            for process in (self.capture, self.inference):
+                if process.is_alive():
+                    # گیر کرده در cap.read یا بارگذاری مدل: بعد از پردازه‌ی اصلی زنده نماند
+                    process.terminate()
+                    process.join(timeout=1)
+                    if process.is_alive():
+                        process.kill()
+                        process.join(timeout=1)
+        finally:
+            self.latest_result = (None, empty_dets(), None)
+            self.frames = None
+            self.display_slots.clear()
+            for block in self.blocks:
+                try:
+                    block.close()
+                except BufferError:      # فریمی هنوز در UI نگه داشته شده؛ با خروج پردازه آزاد می‌شود
+                    pass
+                try:
+                    block.unlink()       # Capture کشته‌شده خانه‌ها را unlink نکرده است
+                except FileNotFoundError:
+                    pass
+            self.blocks = []
+
+    def __del__(self):
+        if getattr(self, "capture", None) is not None and self.capture.is_alive():
+            self.stop()
@@ -0,0 +1,170 @@
+# core/replay.py
+import cv2
+import json
+import os
+import queue
+import threading
+import numpy as np
+from core.yolo_processor import YoloProcessor, CONF_THRES, IOU_THRES
+from core.bucket_monitor import BucketMonitor
+from core.motion import MotionEstimator
+from core.detection_cache import DetectionCache, DetectionCacheWriter, cache_key
+from core.utils import is_day, empty_dets
+from config import config
+
+
+class ReplayEngine:
+    """پردازش آفلاین ویدیوهای ضبط‌شده با حداکثر سرعت: decode در نخ جدا، inference به صورت batch،
+    و زمان BucketMonitor از زمان داخل ویدیو (CAP_PROP_POS_MSEC) به جای ساعت سیستم."""
+
+    def __init__(self, batch_size=8, vid_stride=1, yolo=None, cache_dir=None):
+        self.batch_size = batch_size
+        self.vid_stride = vid_stride
+        self.yolo = yolo
+        self.cache_dir = cache_dir  # None = بدون کش دت‌ها
+
+    def cache_params(self):
+        """تنظیماتی (غیر از ویدیو و مدل‌ها) که دت‌ها یا motion ذخیره‌شده در کش را عوض می‌کنند."""
+        return {
+            "vid_stride": self.vid_stride,
+            "enable_day": bool(config["enable_day"]),
+            "enable_night": bool(config["enable_night"]),
+            "conf_thres": CONF_THRES,
+            "iou_thres": IOU_THRES,
+            "motion_width": config.get("motion_width", 160),
+            "motion_roi": config.get("motion_roi"),
+            "motion_per_frame": True,   # کش‌های قبلی motion را بدون تقسیم بر vid_stride ذخیره کرده‌اند
+        }
+
+    def cache_path(self, path):
+        imgsz = config.get("imgsz") or "native"  # بدون بارگذاری مدل؛ None یعنی اندازه آموزش مدل
+        gate = None
+        if config.get("gate_model_path"):
+            gate = (config["gate_model_path"], config.get("gate_imgsz", 256),
+                    config.get("gate_conf", 0.5), config.get("gate_min_bucket_area", 0))
+        key = cache_key(path, config["model_path"], imgsz, gate, self.cache_params())
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)}.{key}")
+
+    def decode(self, path, frames, stop):
+        cap = cv2.VideoCapture(path)
+        motion = MotionEstimator(config.get("motion_width", 160), config.get("motion_roi"))
+        index = 0
+        try:
+            while not stop.is_set():
+                if not cap.grab():
+                    break
+                if index % self.vid_stride == 0:
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        break
+                    timestamp = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    if not self.put(frames, (index, timestamp, frame, motion.update(frame, self.vid_stride)), stop):
+                        break
+                index += 1
+        finally:
+            cap.release()
+        self.put(frames, None, stop)
+
+    @staticmethod
+    def put(frames, item, stop):
+        """put با صف محدود؛ اگر مصرف‌کننده کنار رفته باشد (stop) به جای گیر کردن False برمی‌گرداند."""
+        while not stop.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def batches(self, path):
+        frames = queue.Queue(maxsize=self.batch_size * 3)
+        stop = threading.Event()
+        thread = threading.Thread(target=self.decode, args=(path, frames, stop), daemon=True)
+        thread.start()
+        batch = []
+        try:
+            while True:
+                item = frames.get()
+                if item is None:
+                    break
+                batch.append(item)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            # مصرف‌کننده زودتر تمام کرد یا خطا داد: نخ decode و VideoCapture آن آزاد شوند
+            stop.set()
+            thread.join(timeout=1.0)
+
+    def detect(self, batch):
+        """مثل حالت زنده: فریم‌های شب (وقتی پردازش شب غیرفعال است) بدون inference رد می‌شوند."""
+        results = [empty_dets()] * len(batch)
+        selected = []
+        for i, (_, _, frame, _) in enumerate(batch):
+            is_daytime = is_day(frame)
+            if (is_daytime and config["enable_day"]) or (not is_daytime and config["enable_night"]):
+                selected.append(i)
+        for i, dets in zip(selected, self.yolo.process_batch([batch[i][2] for i in selected])):
+            results[i] = dets
+        return results
+
+    def frames(self, path, cache_path=None):
+        """(index, timestamp, motion, dets) برای هر فریم با اجرای مدل؛ اگر cache_path داده شود
+        دت‌ها همزمان در کش نوشته می‌شوند."""
+        if self.yolo is None:
+            self.yolo = YoloProcessor()
+        writer = DetectionCacheWriter(cache_path, {"video": path, "params": self.cache_params()}) if cache_path else None
+        complete = False
+        try:
+            for batch in self.batches(path):
+                for (index, timestamp, _, motion_change), dets in zip(batch, self.detect(batch)):
+                    if writer:
+                        writer.append(index, timestamp, motion_change, dets)
+                    yield index, timestamp, motion_change, dets
+            complete = True
+        finally:
+            if writer:
+                writer.close(complete)
+
+    def updates(self, path, cache_path, monitor):
+        """monitor را فریم به فریم جلو می‌برد و (index, cycle) برمی‌گرداند؛
+        با کش معتبر فقط آرایه‌ها خوانده می‌شوند و مدل اجرا نمی‌شود."""
+        cache = DetectionCache(cache_path) if cache_path and DetectionCache.exists(cache_path) else None
+        if cache is not None and cache.meta.get("params") != json.loads(json.dumps(self.cache_params())):
+            cache = None   # کش با تنظیمات دیگری ساخته شده (مثلاً کش‌های قدیمی بدون params)؛ دوباره ساخته می‌شود
+        if cache is not None:
+            bucket_areas = cache.bucket_areas()
+            teeth_frames, teeth_areas = cache.teeth()
+            bounds = np.searchsorted(teeth_frames, np.arange(cache.num_frames + 1))
+            index = np.asarray(cache.frame["index"])
+            times = np.asarray(cache.frame["time"])
+            motion = np.asarray(cache.frame["motion"])
+            for i in range(cache.num_frames):
+                cycle = monitor.update(int(bucket_areas[i]), teeth_areas[bounds[i]:bounds[i + 1]],
+                                       float(motion[i]), float(times[i]))
+                yield int(index[i]), cycle
+            return
+
+        for index, timestamp, motion_change, dets in self.frames(path, cache_path):
+            yield index, monitor.update_from_dets(dets, motion_change, timestamp)
+
+    def run(self, path, events_path=None):
+        """ویدیو را پردازش می‌کند و لیست رویدادها (چرخه‌های تخلیه) را برمی‌گرداند."""
+        monitor = BucketMonitor(config)
+        cache_path = self.cache_path(path) if self.cache_dir else None
+        events = []
+        out = open(events_path, "w", encoding="utf-8") if events_path else None
+        try:
+            for index, cycle in self.updates(path, cache_path, monitor):
+                if cycle is None:
+                    continue
+                event = dict(cycle, video=path, frame=index)
+                events.append(event)
+                if out:
+                    out.write(json.dumps(event, ensure_ascii=False) + "\n")
+        finally:
+            if out:
+                out.close()
+        return events
@@ -0,0 +1,60 @@
+# core/service.py
+import time
+import threading
+from collections import deque
+from core.camera_handler import CameraHandler
+from core.bucket_monitor import STATUS_CHECKING, STATUS_OK, STATUS_ALERT
+
+# کلید انگلیسی وضعیت‌ها برای metrics / JSON
+STATUS_KEYS = {STATUS_CHECKING: "checking", STATUS_OK: "ok", STATUS_ALERT: "alert"}
+
+
+class MonitorService:
+    """اجرای بدون Qt: CameraHandler (با BucketMonitor داخلی)؛ با هر نتیجه‌ی جدید pipeline شمارنده‌ها
+    و رویدادها به‌روز می‌شوند و وضعیت، رویدادها و آمار pipeline برای MetricsServer نگه داشته می‌شود."""
+
+    def __init__(self, source=None, max_events=100):
+        self.events = deque(maxlen=max_events)   # چرخه‌های تخلیه‌ی اخیر
+        self.cycles = 0
+        self.alerts = 0
+        self.frames = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.camera = CameraHandler(source)
+        self.monitor = self.camera.monitor
+        self.camera.add_listener(self.on_result)
+
+    def on_result(self, meta):
+        cycle = meta["cycle"]
+        with self.lock:
+            self.frames += 1
+            if cycle is not None:
+                self.cycles += 1
+                self.alerts += int(cycle["alert"])
+                self.events.append(dict(cycle, status=STATUS_KEYS.get(cycle["status"], cycle["status"])))
+
+    def status(self):
+        with self.lock:
+            last_cycle = self.events[-1] if self.events else None
+            return {
+                "source": str(self.camera.source),
+                "status": STATUS_KEYS.get(self.monitor.get_status(), self.monitor.get_status()),
+                "phase": self.camera.get_phase(),
+                "in_discharge": self.monitor.in_discharge,
+                "uptime_sec": time.time() - self.started,
+                "frames": self.frames,
+                "cycles": self.cycles,
+                "alerts": self.alerts,
+                "last_cycle": last_cycle,
+                "capture": self.camera.get_capture_stats(),
+                "decode": self.camera.get_decode_stats(),
+                "clips": self.camera.clip_recorder.stats() if self.camera.clip_recorder else None,
+            }
+
+    def recent_events(self, limit=None):
+        with self.lock:
+            events = list(self.events)
+        return events[-limit:] if limit else events
+
+    def stop(self):
+        self.camera.stop()
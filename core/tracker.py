@@ -0,0 +1,106 @@
+# core/tracker.py
+import numpy as np
+from core.utils import empty_dets, make_dets
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU همه‌ی جفت باکس‌ها (xyxy) به صورت برداری."""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(1, -1, 4)
+    iw = (np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])).clip(0)
+    ih = (np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])).clip(0)
+    inter = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / (area_a + area_b - inter + 1e-7)
+
+
+class Track:
+    __slots__ = ("id", "cls", "bbox", "velocity", "misses")
+
+    def __init__(self, track_id, cls, bbox):
+        self.id = track_id
+        self.cls = cls
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)  # تغییر باکس در هر فریم
+        self.misses = 0
+
+
+class BoxTracker:
+    """ردیاب سبک IoU با مدل سرعت ثابت (فیلتر alpha-beta، نسخه‌ی ساده‌ی Kalman).
+    روی keyframe ها با خروجی YOLO به‌روزرسانی می‌شود و بین آن‌ها باکس‌ها را پیش‌بینی می‌کند."""
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, alpha=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses    # تعداد keyframe بدون تطبیق قبل از حذف track
+        self.alpha = alpha              # وزن سرعت جدید در برابر سرعت قبلی
+        self.tracks = []
+        self.next_id = 1
+        self.frames_since_update = 0
+
+    def update(self, dets):
+        """تطبیق دت‌های keyframe با track ها؛ خروجی همان dets با شناسه‌ی پایدار "id"."""
+        elapsed = self.frames_since_update   # تعداد فریم‌های پیش‌بینی‌شده از keyframe قبلی
+        self.frames_since_update = 0
+        matched = set()
+        dets = dets.copy()
+
+        for cls in ("bucket", "teeth"):
+            cls_index = np.flatnonzero(dets["class"] == cls)
+            cls_dets = dets[cls_index]
+            cls_tracks = [t for t in self.tracks if t.cls == cls]
+            pairs = []
+            if len(cls_dets) and cls_tracks:
+                ious = iou_matrix([t.bbox for t in cls_tracks], cls_dets["bbox"])
+                # تطبیق حریصانه از بیشترین IoU
+                for ti, di in zip(*np.unravel_index(np.argsort(-ious, axis=None), ious.shape)):
+                    if ious[ti, di] < self.iou_threshold:
+                        break
+                    pairs.append((ti, di))
+
+            used_tracks, used_dets = set(), set()
+            for ti, di in pairs:
+                if ti in used_tracks or di in used_dets:
+                    continue
+                used_tracks.add(ti)
+                used_dets.add(di)
+                track = cls_tracks[ti]
+                bbox = np.asarray(cls_dets[di]["bbox"], dtype=np.float32)
+                # bbox پیش‌بینی‌شده تا این لحظه جلو رفته؛ جابجایی واقعی از keyframe قبلی محاسبه می‌شود
+                previous = track.bbox - track.velocity * elapsed
+                velocity = (bbox - previous) / (elapsed + 1)
+                track.velocity = self.alpha * velocity + (1 - self.alpha) * track.velocity
+                track.bbox = bbox
+                track.misses = 0
+                matched.add(track.id)
+                dets["id"][cls_index[di]] = track.id
+
+            for di, det in enumerate(cls_dets):
+                if di not in used_dets:
+                    track = Track(self.next_id, cls, det["bbox"])
+                    self.next_id += 1
+                    self.tracks.append(track)
+                    matched.add(track.id)
+                    dets["id"][cls_index[di]] = track.id
+
+        for track in self.tracks:
+            if track.id not in matched:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return dets
+
+    def predict(self):
+        """باکس‌ها را یک فریم جلو می‌برد (فریم‌های بین keyframe ها)."""
+        self.frames_since_update += 1
+        for track in self.tracks:
+            track.bbox = track.bbox + track.velocity
+        visible = [t for t in self.tracks if not t.misses]
+        if not visible:
+            return empty_dets()
+        boxes = np.round([t.bbox for t in visible])
+        boxes[:, 2:] = np.maximum(boxes[:, 2:], boxes[:, :2])
+        return make_dets([t.cls for t in visible], boxes, ids=[t.id for t in visible])
+
+    def reset(self):
+        self.tracks = []
+        self.frames_since_update = 0
@@ -1,4 +1,7 @@
 # core/utils.py
+import os
+import re
+import zlib
 import cv2
 import numpy as np
 
@@ -8,3 +11,41 @@ def is_day(frame):
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     brightness = np.mean(gray)
     return brightness > 90  # این عدد قابل تغییر است
+
+
+def source_tag(source):
+    """شناسه‌ی کوتاه و امن برای نام فایل از منبع ویدیو (شماره وب‌کم، مسیر فایل یا آدرس RTSP)؛
+    از آدرس فقط نام آخر و hash آن می‌ماند (نام کاربری/رمز داخل URL در نام فایل نمی‌آید)."""
+    text = str(source)
+    if text.isdigit():
+        return f"cam{text}"
+    name = os.path.splitext(os.path.basename(text.rstrip("/")))[0]
+    name = re.sub(r"[^\w.-]+", "_", name).strip("_")[:32] or "cam"
+    return f"{name}_{zlib.crc32(text.encode()):08x}"
+
+
+# آرایه‌ی ساخت‌یافته‌ی دت‌ها (به جای لیست dict)؛ det["class"] و det["area"] مثل قبل کار می‌کنند
+DET_DTYPE = np.dtype([
+    ("class", "U8"),
+    ("bbox", np.int32, (4,)),
+    ("area", np.int64),
+    ("conf", np.float32),
+    ("id", np.int32),          # شناسه‌ی ردیاب (0 = بدون ردیابی)
+])
+
+
+def empty_dets():
+    return np.zeros(0, dtype=DET_DTYPE)
+
+
+def make_dets(classes, boxes, confs=None, ids=None):
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    dets = np.zeros(len(boxes), dtype=DET_DTYPE)
+    dets["class"] = classes
+    dets["bbox"] = boxes
+    dets["area"] = (boxes[:, 2] - boxes[:, 0]).astype(np.int64) * (boxes[:, 3] - boxes[:, 1])
+    if confs is not None:
+        dets["conf"] = confs
+    if ids is not None:
+        dets["id"] = ids
+    return dets
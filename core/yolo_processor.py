@@ -1,21 +1,89 @@
 # core/yolo_processor.py
 import cv2
 import torch
+import torch.nn.functional as F
 from coreYoloV5.utils.torch_utils import select_device
-from coreYoloV5.utils.general import non_max_suppression
-from coreYoloV5.utils.plots import Annotator, colors
+from coreYoloV5.utils.augmentations import classify_transforms, letterbox
+from coreYoloV5.utils.general import LOGGER, check_img_size, make_divisible, non_max_suppression, scale_boxes
+from coreYoloV5.utils.metrics import box_iou
 from coreYoloV5.models.common import DetectMultiBackend
+from core.utils import empty_dets, make_dets
+from core.latency import latency
 from config import config
 
-def boxes_intersect(boxA, boxB):
-    xA = max(boxA[0], boxB[0])
-    yA = max(boxA[1], boxB[1])
-    xB = min(boxA[2], boxB[2])
-    yB = min(boxA[3], boxB[3])
+CONF_THRES, IOU_THRES = 0.45, 0.45   # آستانه‌های NMS مدل اصلی (بخشی از کلید کش دت‌ها در replay)
+
+
+def model_input_size(model, default=640):
+    """اندازه ورودی که مدل با آن آموزش دیده: opt.imgsz همان checkpoint که DetectMultiBackend بارگذاری کرده
+    (بدون torch.load دوباره) یا shape ورودی مدل ONNX؛ در غیر این صورت default با هشدار."""
+    if model.pt:
+        opt = getattr(model.model, "opt", None)
+        imgsz = (opt if isinstance(opt, dict) else vars(opt) if opt is not None else {}).get("imgsz")
+        if imgsz:
+            return imgsz
+    elif model.onnx:
+        shape = model.session.get_inputs()[0].shape
+        if all(isinstance(x, int) for x in shape[2:]):
+            return list(shape[2:])
+    LOGGER.warning(f"WARNING: training imgsz not found in model, using imgsz={default} (set config['imgsz'])")
+    return default
+
+
+def to_input(im, out, device):
+    """در یک گذر: نرمال‌سازی + BGR->RGB + HWC->CHW مستقیم داخل out (3, h, w)."""
+    src = torch.from_numpy(im).to(device, non_blocking=True)  # آپلود uint8
+    for c in range(3):
+        torch.div(src[..., 2 - c], 255.0, out=out[c])
+
+
+def letterbox_into(im0, imgsz, stride, out, device):
+    im, ratio, pad = letterbox(im0, imgsz, stride=stride, auto=False)
+    to_input(im, out, device)
+    return ratio, pad
+
+
+class BucketGate:
+    """مدل سبک مرحله‌ی اول cascade: تصمیم می‌گیرد bucket حاضر و به اندازه کافی بزرگ است یا نه.
+    هم مدل تشخیص (detect) و هم طبقه‌بند coreYoloV5/classify پشتیبانی می‌شود؛ مدل باید کلاسی به نام
+    "bucket" داشته باشد. gate_min_bucket_area فقط برای مدل تشخیص است (طبقه‌بند باکس ندارد)."""
+
+    def __init__(self, weights, device, config):
+        self.config = config
+        self.device = device
+        self.model = DetectMultiBackend(weights, device=device)
+        self.stride = int(self.model.stride)
+        self.imgsz = check_img_size(config.get("gate_imgsz", 256), s=self.stride)
+        names = self.model.names if isinstance(self.model.names, dict) else dict(enumerate(self.model.names))
+        self.bucket_cls = next((int(i) for i, n in names.items() if n == "bucket"), None)
+        if self.bucket_cls is None:
+            raise ValueError(f"gate model {weights} has no 'bucket' class (classes: {list(names.values())})")
+        dtype = torch.half if self.model.fp16 else torch.float
+        self.input = torch.zeros((1, 3, self.imgsz, self.imgsz), dtype=dtype, device=device)
+
+        # نوع مدل از شکل خروجی: طبقه‌بند (batch, nc) و تشخیص (batch, n, 5 + nc)
+        with torch.no_grad():
+            out = self.model(self.input)
+        out = out[0] if isinstance(out, (list, tuple)) else out
+        self.classifier = out.ndim == 2
+        self.transforms = classify_transforms(self.imgsz) if self.classifier else None
+
+    def bucket_present(self, im0):
+        conf = self.config.get("gate_conf", 0.5)
+        if self.classifier:
+            im = self.transforms(cv2.cvtColor(im0, cv2.COLOR_BGR2RGB)).unsqueeze(0).to(self.device)
+            probs = F.softmax(self.model(im.half() if self.model.fp16 else im), dim=1)
+            return float(probs[0, self.bucket_cls]) >= conf
+
+        ratio_pad = letterbox_into(im0, self.imgsz, self.stride, self.input[0], self.device)
+        det = non_max_suppression(self.model(self.input), conf_thres=conf, iou_thres=0.45)[0]
+        det = det[det[:, 5] == self.bucket_cls]
+        if not len(det):
+            return False
+        boxes = scale_boxes(self.input.shape[2:], det[:, :4], im0.shape, ratio_pad)
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        return float(areas.max()) >= self.config.get("gate_min_bucket_area", 0)
 
-    interWidth = xB - xA
-    interHeight = yB - yA
-    return interWidth > 0 and interHeight > 0
 
 class YoloProcessor:
     def __init__(self):
@@ -24,92 +92,217 @@ class YoloProcessor:
         self.model = DetectMultiBackend(config["model_path"], device=self.device)
         self.names = self.model.names
         self.stride = int(self.model.stride)
+        # شماره کلاس‌ها (اگر کلاسی در مدل نبود -1 می‌ماند و هیچ دتی به آن نمی‌خورد)
+        names = self.names if isinstance(self.names, dict) else dict(enumerate(self.names))
+        self.bucket_cls = next((int(i) for i, n in names.items() if n == "bucket"), -1)
+        self.teeth_cls = next((int(i) for i, n in names.items() if n == "teeth"), -1)
+
+        # اندازه ورودی: از تنظیمات، یا اگر None بود اندازه‌ای که مدل با آن آموزش دیده
+        imgsz = config.get("imgsz") or model_input_size(self.model)
+        imgsz = check_img_size(imgsz, s=self.stride)
+        self.imgsz = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+        self.inputs = {}                 # تنسور ورودی از پیش تخصیص‌یافته برای هر اندازه (batch, 3, h, w)
+        self.grids = {}                  # grid های لایه Detect برای هر اندازه
+        self.roi = None                  # برش فعلی اطراف bucket در حالت roi_inference
+
+        # cascade: مدل سبک روی همه فریم‌ها، مدل اصلی فقط وقتی bucket حاضر است
+        gate_path = config.get("gate_model_path")
+        self.gate = BucketGate(gate_path, self.device, config) if gate_path else None
+        self.timings = {"gate": latency.timer("gate", self.device), "detect": latency.timer("detect", self.device)}
+        self.t_letterbox = latency.timer("letterbox")
+        self.t_normalize = latency.timer("normalize", self.device)   # آپلود + نرمال‌سازی
+        self.t_forward = latency.timer("forward", self.device)
+        self.t_nms = latency.timer("nms", self.device)
+        self.t_scale = latency.timer("scale_boxes")
+        self.t_postprocess = latency.timer("postprocess")
+        self.calls = {"gate": 0, "detect": 0}
+        self.model.warmup(imgsz=(1, 3, *self.imgsz))
+
+        # اندازه‌های ورودی متغیر بر اساس فاز (فقط مدل pt؛ مدل‌های export شده اندازه ثابت دارند)
+        adaptive = config.get("adaptive_imgsz") if self.model.pt else None
+        self.adaptive_imgsz = {k: check_img_size(v, s=self.stride) for k, v in (adaptive or {}).items()}
+        for size in sorted(set(self.adaptive_imgsz.values())):
+            self.prepare_imgsz(size)
+
+    def detect_layer(self):
+        model = getattr(self.model, "model", None)
+        layer = model.model[-1] if hasattr(model, "model") else None
+        return layer if hasattr(layer, "grid") else None
+
+    def set_imgsz(self, imgsz):
+        """تغییر اندازه ورودی؛ تنسور ورودی و grid های هر اندازه نگه داشته می‌شوند تا تعویض هزینه‌ای نداشته باشد."""
+        imgsz = (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+        if imgsz == self.imgsz:
+            return
+        layer = self.detect_layer()
+        if layer is not None:
+            self.grids[self.imgsz] = (list(layer.grid), list(layer.anchor_grid))
+            if imgsz in self.grids:
+                layer.grid, layer.anchor_grid = (list(g) for g in self.grids[imgsz])
+        self.imgsz = imgsz
+
+    def set_phase(self, phase):
+        """انتخاب اندازه ورودی بر اساس فاز (idle / active / discharge) اگر adaptive_imgsz تنظیم شده باشد."""
+        size = self.adaptive_imgsz.get(phase)
+        if size:
+            self.set_imgsz(size)
+
+    def prepare_imgsz(self, imgsz):
+        """یک forward خالی برای ساخت بافر و grid های این اندازه، و بازگشت به اندازه فعلی."""
+        current = self.imgsz
+        self.set_imgsz(imgsz)
+        with torch.no_grad():
+            self.model(self.input_tensor(1).zero_())
+        self.set_imgsz(current)
+
+    def input_tensor(self, n):
+        tensor = self.inputs.get(self.imgsz)
+        if tensor is None or tensor.shape[0] < n:
+            dtype = torch.half if self.model.fp16 else torch.float
+            tensor = torch.empty((n, 3, *self.imgsz), dtype=dtype, device=self.device)
+            self.inputs[self.imgsz] = tensor
+        return tensor[:n]
+
+    def preprocess(self, frames):
+        """letterbox بدون تغییر نسبت ابعاد، و در یک گذر: نرمال‌سازی + BGR->RGB + HWC->CHW
+        مستقیم داخل تنسور ورودی. خروجی: (img, ratio_pads) برای scale_boxes."""
+        img = self.input_tensor(len(frames))
+        ratio_pads = []
+        for i, im0 in enumerate(frames):
+            with self.t_letterbox:
+                im, ratio, pad = letterbox(im0, self.imgsz, stride=self.stride, auto=False)
+            with self.t_normalize:
+                to_input(im, img[i], self.device)
+            ratio_pads.append((ratio, pad))
+        return img, ratio_pads
+
+    def infer(self, frames):
+        """forward + NMS؛ خروجی: det هر تصویر در مختصات همان تصویر."""
+        img, ratio_pads = self.preprocess(frames)
+
+        with self.t_forward:
+            pred = self.model(img)
+        with self.t_nms:
+            pred = non_max_suppression(pred, conf_thres=CONF_THRES, iou_thres=IOU_THRES)
+
+        with self.t_scale:
+            for det, im0, ratio_pad in zip(pred, frames, ratio_pads):
+                if len(det):
+                    det[:, :4] = scale_boxes(img.shape[2:], det[:, :4], im0.shape, ratio_pad).round()
+        return pred
+
+    def process_batch(self, frames):
+        """چند فریم (مثلاً از چند دوربین) را با یک forward اجرا می‌کند و برای هر فریم dets برمی‌گرداند."""
+        if not frames:
+            return []
+        selected = list(range(len(frames)))
+        if self.gate is not None:
+            with self.timings["gate"]:
+                selected = [i for i in selected if self.gate.bucket_present(frames[i])]
+            self.calls["gate"] += len(frames)
+        results = [empty_dets()] * len(frames)
+        if selected:
+            with self.timings["detect"]:
+                for i, det in zip(selected, self.infer([frames[i] for i in selected])):
+                    with self.t_postprocess:
+                        results[i] = self.collect_dets(det)
+            self.calls["detect"] += len(selected)
+        return results
+
+    def update_roi(self, box, shape):
+        """ناحیه‌ی برش اطراف bucket با حاشیه؛ با هیسترزیس تا وقتی bucket داخل برش قبلی است
+        و برش خیلی بزرگ‌تر از لازم نشده، همان برش قبلی حفظ شود."""
+        h, w = shape[:2]
+        bx1, by1, bx2, by2 = (float(v) for v in box)
+        pad = self.config.get("roi_padding", 0.25) * max(bx2 - bx1, by2 - by1)
+        wanted = (max(int(bx1 - pad), 0), max(int(by1 - pad), 0), min(int(bx2 + pad), w), min(int(by2 + pad), h))
+        if self.roi is not None:
+            rx1, ry1, rx2, ry2 = self.roi
+            inside = bx1 >= rx1 and by1 >= ry1 and bx2 <= rx2 and by2 <= ry2
+            wanted_area = max((wanted[2] - wanted[0]) * (wanted[3] - wanted[1]), 1)
+            if inside and (rx2 - rx1) * (ry2 - ry1) < 2 * wanted_area:
+                return self.roi
+        self.roi = wanted
+        return self.roi
+
+    def infer_roi(self, im0):
+        """دو مرحله: کل فریم با رزولوشن پایین برای پیدا کردن bucket، بعد برش اطراف bucket
+        با رزولوشن نزدیک به اصلی برای دندان‌ها. خروجی در مختصات فریم اصلی.
+        مثل adaptive_imgsz فقط برای مدل pt؛ مدل‌های export شده (ONNX/TensorRT) اندازه ورودی ثابت دارند."""
+        if not self.model.pt:
+            return self.infer([im0])[0]
+        base = self.imgsz
+        self.set_imgsz(check_img_size(self.config.get("roi_search_imgsz", 320), s=self.stride))
+        det = self.infer([im0])[0]
+        buckets = det[det[:, 5] == self.bucket_cls]
+        if not len(buckets):
+            self.set_imgsz(base)
+            self.roi = None
+            return det
+
+        x1, y1, x2, y2 = self.update_roi(buckets[0, :4], im0.shape)   # مطمئن‌ترین bucket
+        crop = im0[y1:y2, x1:x2]
+        # اندازه ورودی ≈ اندازه واقعی برش (گرد شده به مضرب 128 تا تعداد اندازه‌ها محدود بماند)
+        size = min(make_divisible(max(crop.shape[:2]), 128), max(base))
+        self.set_imgsz(size)
+        det_crop = self.infer([crop])[0]
+        self.set_imgsz(base)
+
+        det_crop[:, [0, 2]] += x1
+        det_crop[:, [1, 3]] += y1
+        if not (det_crop[:, 5] == self.bucket_cls).any():
+            det_crop = torch.cat((det_crop, buckets))
+        return det_crop
+
+    def collect_dets(self, det):
+        """تبدیل خروجی NMS (در مختصات تصویر اصلی) به آرایه‌ی bucket ها و teeth های همپوشان،
+        به صورت برداری و بدون حلقه روی تک‌تک دت‌ها."""
+        if det is None or not len(det):
+            return empty_dets()
+        det = det.flip(0)  # ترتیب قبلی: از کم‌اطمینان به پراطمینان (آخرین bucket = مطمئن‌ترین)
+        cls = det[:, 5]
+        is_bucket = cls == self.bucket_cls
+        is_teeth = cls == self.teeth_cls
+        buckets = det[is_bucket]
+        teeth = det[is_teeth]
+
+        # فقط teeth هایی که حداقل با یک bucket همپوشانی دارند
+        if len(teeth) and len(buckets):
+            teeth = teeth[(box_iou(teeth[:, :4], buckets[:, :4]) > 0).any(1)]
+        else:
+            teeth = teeth[:0]
+
+        kept = torch.cat((buckets, teeth)).cpu().numpy()
+        classes = ["bucket"] * len(buckets) + ["teeth"] * len(teeth)
+        return make_dets(classes, kept[:, :4], kept[:, 4])
+
+    def detect(self, im0):
+        """فقط دت‌ها را برمی‌گرداند؛ رسم باکس‌ها در لایه‌ی UI روی تصویر کوچک‌شده انجام می‌شود."""
+        if self.gate is not None:
+            with self.timings["gate"]:
+                present = self.gate.bucket_present(im0)
+            self.calls["gate"] += 1
+            if not present:
+                return empty_dets()
+
+        with self.timings["detect"]:
+            if self.config.get("roi_inference", False):
+                det = self.infer_roi(im0)
+            else:
+                det = self.infer([im0])[0]
+            with self.t_postprocess:
+                dets = self.collect_dets(det)
+        self.calls["detect"] += 1
+        return dets
 
-    def process_with_dets(self, im0):
-        h0, w0 = im0.shape[:2]
-        input_w, input_h = 640, 640
-        im_resized = cv2.resize(im0, (input_w, input_h))
-
-        width_ratio = w0 / input_w
-        height_ratio = h0 / input_h
-
-        img = torch.from_numpy(im_resized).to(self.device)
-        img = img.float() / 255.0
-        img = img.permute(2, 0, 1).unsqueeze(0)
-
-        pred = self.model(img)
-        pred = non_max_suppression(pred, conf_thres=0.45, iou_thres=0.45)
-
-        annotator = Annotator(im0, line_width=2)
-        dets = []
-
-        # ذخیره باکس bucket ها و teeth ها جداگانه برای بررسی همپوشانی
-        bucket_boxes = []
-        teeth_candidates = []
-
-        for det in pred:
-            if det is not None and len(det):
-                det[:, [0, 2]] *= width_ratio
-                det[:, [1, 3]] *= height_ratio
-                det[:, :4] = det[:, :4].round()
-                for *xyxy, conf, cls in reversed(det):
-                    label = self.names[int(cls)]
-                    x1, y1, x2, y2 = map(int, xyxy)
-                    area = (x2 - x1) * (y2 - y1)
-                    if label == "bucket":
-                        bucket_boxes.append({"bbox": [x1, y1, x2, y2], "area": area})
-                    elif label == "teeth":
-                        teeth_candidates.append({"bbox": [x1, y1, x2, y2], "area": area})
-
-                    if self.config.get("draw_boxes", True):
-                        annotator.box_label(xyxy, label, color=colors(int(cls), True))
-
-        # حالا فقط teeth هایی که حداقل با یک bucket همپوشانی دارند انتخاب کن
-        teeth_filtered = []
-        for tooth in teeth_candidates:
-            for bucket in bucket_boxes:
-                if boxes_intersect(tooth["bbox"], bucket["bbox"]):
-                    teeth_filtered.append(tooth)
-                    break  # یکبار یافتن همپوشانی کافی است
-
-        # ساخت لیست نهایی دت‌ها با bucket ها و teeth های فیلتر شده
-        for bucket in bucket_boxes:
-            dets.append({"class": "bucket", "area": bucket["area"], "bbox": bucket["bbox"]})
-        for tooth in teeth_filtered:
-            dets.append({"class": "teeth", "area": tooth["area"], "bbox": tooth["bbox"]})
-
-        # --- رسم متن کالیبراسیون روی تصویر ---
-        if self.config.get("show_area_values", False) and len(dets) > 0:
-            lines = []
-            bucket_idx = 1
-            teeth_idx = 1
-            for det in dets:
-                label = det["class"]
-                area = int(det["area"])
-                if label == "bucket":
-                    lines.append(f"Bucket #{bucket_idx}: {area}")
-                    bucket_idx += 1
-                elif label == "teeth":
-                    lines.append(f"Teeth #{teeth_idx}: {area}")
-                    teeth_idx += 1
-
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.6
-            thickness = 1
-            color_text = (0, 255, 0)  # سبز روشن
-
-            margin = 10
-            line_height = 20
-            x = margin
-            y = im0.shape[0] - margin
-
-            box_width = 250
-            box_height = line_height * len(lines) + 10
-
-            cv2.rectangle(im0, (x - 5, y - box_height), (x + box_width, y + 5), (0, 0, 0), cv2.FILLED)
-
-            for i, line in enumerate(lines):
-                text_pos = (x, y - line_height * (len(lines) - i - 1))
-                cv2.putText(im0, line, text_pos, font, font_scale, color_text, thickness, cv2.LINE_AA)
-
-        return annotator.result(), dets
+    def stage_timings(self):
+        """زمان هر مرحله cascade: تعداد اجرا، مجموع و میانگین (ثانیه) و زمان آخرین اجرا."""
+        return {
+            name: {
+                "calls": self.calls[name],
+                "total": profile.t,
+                "mean": profile.t / self.calls[name] if self.calls[name] else 0.0,
+                "last": getattr(profile, "dt", 0.0),
+            }
+            for name, profile in self.timings.items()
+        }
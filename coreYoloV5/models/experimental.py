@@ -96,7 +96,9 @@ def attempt_load(weights, device=None, inplace=True, fuse=True):
     model = Ensemble()
     for w in weights if isinstance(weights, list) else [weights]:
         ckpt = torch.load(attempt_download(w), map_location="cpu")  # load
+        opt = ckpt.get("opt")  # training options (imgsz, ...)
         ckpt = (ckpt.get("ema") or ckpt["model"]).to(device).float()  # FP32 model
+        ckpt.opt = opt
 
         # Model compatibility updates
         if not hasattr(ckpt, "stride"):
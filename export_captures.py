@@ -0,0 +1,44 @@
+import argparse
+from datetime import datetime
+from core.capture_archive import CaptureChunk, chunk_paths, export_jpegs
+
+
+def parse_time(text, day):
+    """HH:MM[:SS] نسبت به روز chunk یا تاریخ کامل YYYY-MM-DD HH:MM:SS"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%H:%M:%S", "%H:%M"):
+        try:
+            t = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if fmt.startswith("%H"):
+            t = datetime.combine(day, t.time())
+        return t.timestamp()
+    raise argparse.ArgumentTypeError(f"bad time: {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="تبدیل آرشیو عکس‌ها (chunk های .cap) به JPEG و JSON برای برچسب‌زنی")
+    parser.add_argument("path", help="فایل chunk، پوشه‌ی یک روز (logs/<date>) یا پوشه‌ی logs")
+    parser.add_argument("--out", default="export", help="پوشه‌ی خروجی")
+    parser.add_argument("--start", default=None, help="از زمان (HH:MM[:SS] یا YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument("--end", default=None, help="تا زمان")
+    parser.add_argument("--no-meta", action="store_true", help="بدون فایل JSON کنار عکس‌ها")
+    parser.add_argument("--list", action="store_true", help="فقط نمایش chunk ها و تعداد رکوردها")
+    args = parser.parse_args()
+
+    total = 0
+    for path in chunk_paths(args.path):
+        chunk = CaptureChunk(path)
+        if not len(chunk):
+            continue
+        day = datetime.fromtimestamp(chunk.times[0]).date()
+        start = parse_time(args.start, day) if args.start else chunk.times[0]
+        end = parse_time(args.end, day) if args.end else chunk.times[-1]
+        indices = chunk.between(start, end)
+        if args.list:
+            print(f"{path}: {len(chunk)} records, {len(indices)} in range, "
+                  f"{datetime.fromtimestamp(chunk.times[0]):%H:%M:%S} - {datetime.fromtimestamp(chunk.times[-1]):%H:%M:%S}")
+            continue
+        total += export_jpegs(chunk, args.out, indices, with_meta=not args.no_meta)
+    if not args.list:
+        print(f"{total} captures written to {args.out}")
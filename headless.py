@@ -0,0 +1,28 @@
+import argparse
+import time
+from core.service import MonitorService
+from core.metrics_server import MetricsServer
+from config import config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="اجرای بدون رابط گرافیکی؛ وضعیت و آمار از طریق HTTP")
+    parser.add_argument("--source", default=None, help="ورودی دوربین/ویدیو (پیش‌فرض: input_source در config)")
+    parser.add_argument("--host", default=config.get("metrics_host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=config.get("metrics_port", 8085))
+    parser.add_argument("--unix", default=config.get("metrics_unix_socket"), help="مسیر Unix socket به جای TCP")
+    args = parser.parse_args()
+
+    service = MonitorService(args.source)
+    server = MetricsServer(service, args.host, args.port, args.unix)
+    print(f"serving on {args.unix or f'http://{args.host}:{args.port}'} (/metrics, /status, /events, /latency)")
+    last_status = None
+    try:
+        while True:
+            status = service.status()["status"]
+            if status != last_status:
+                print(f"[{service.camera.source}] {status}")
+                last_status = status
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        service.stop()
@@ -0,0 +1,16 @@
+import time
+from core.inference_scheduler import InferenceScheduler
+
+if __name__ == "__main__":
+    scheduler = InferenceScheduler()
+    last_status = [None] * len(scheduler.cameras)
+    try:
+        while True:
+            for i, camera in enumerate(scheduler.cameras):
+                status = scheduler.get_status(i)
+                if status != last_status[i]:
+                    print(f"[{camera.source}] {status}")
+                    last_status[i] = status
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
@@ -0,0 +1,23 @@
+import argparse
+import time
+from core.replay import ReplayEngine
+from config import config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="پردازش آفلاین ویدیوهای ضبط‌شده و نوشتن رویدادهای تخلیه")
+    parser.add_argument("videos", nargs="+", help="مسیر فایل‌های ویدیو")
+    parser.add_argument("--events", default="events.jsonl", help="فایل خروجی رویدادها (JSON lines)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--vid-stride", type=int, default=1, help="پردازش هر N فریم")
+    parser.add_argument("--cache-dir", default=config.get("detection_cache_dir", "cache/detections"),
+                        help="پوشه کش دت‌ها (اجرای دوباره با آستانه‌های جدید بدون مدل)")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    engine = ReplayEngine(args.batch_size, args.vid_stride, cache_dir=None if args.no_cache else args.cache_dir)
+    for video in args.videos:
+        start = time.time()
+        events_path = args.events if len(args.videos) == 1 else f"{video}.events.jsonl"
+        events = engine.run(video, events_path)
+        alerts = sum(event["alert"] for event in events)
+        print(f"{video}: {len(events)} cycles, {alerts} alerts, {time.time() - start:.1f}s -> {events_path}")
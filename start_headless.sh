@@ -0,0 +1,3 @@
+#!/bin/bash
+source /home/shovel/PycharmProjects/PythonProject/.venv/bin/activate
+python /home/shovel/Downloads/Documents/tempYoloShovel/headless.py "$@"
@@ -0,0 +1,27 @@
+# tests/test_calibration.py
+import pytest
+from core.calibration import load_ground_truth
+
+
+def write_truth(tmp_path, rows):
+    path = tmp_path / "truth.csv"
+    path.write_text("video,time,type\n" + "".join(f"{row}\n" for row in rows), encoding="utf-8")
+    return str(path)
+
+
+def test_load_ground_truth(tmp_path):
+    truth = load_ground_truth(write_truth(tmp_path, ["a/v1.mp4,12.5,discharge", "v1.mp4,3,missing_tooth",
+                                                     "v1.mp4,1.0, discharge"]))
+    assert list(truth["v1.mp4"]["discharge"]) == [1.0, 12.5]
+    assert list(truth["v1.mp4"]["missing_tooth"]) == [3.0]
+
+
+def test_unknown_event_type_names_file_and_line(tmp_path):
+    path = write_truth(tmp_path, ["v1.mp4,12.5,discharge", "v1.mp4,14.0,dischrage"])
+    with pytest.raises(ValueError, match=r"truth\.csv:3: unknown event type 'dischrage'"):
+        load_ground_truth(path)
+
+
+def test_invalid_time_names_file_and_line(tmp_path):
+    with pytest.raises(ValueError, match=r"truth\.csv:2: invalid time 'x'"):
+        load_ground_truth(write_truth(tmp_path, ["v1.mp4,x,discharge"]))
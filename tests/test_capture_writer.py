@@ -0,0 +1,38 @@
+# tests/test_capture_writer.py
+import os
+import time
+import cv2
+import numpy as np
+from core.capture_writer import CaptureWriter
+
+
+def write_one(writer, frame, timestamp):
+    written = []
+    writer.on_written = lambda t, path, offset, meta: written.append((path, offset))
+    writer.submit(frame, timestamp, (64, 48))
+    deadline = time.time() + 5.0
+    while not written and time.time() < deadline:
+        time.sleep(0.01)
+    writer.stop()
+    return written
+
+
+def test_two_cameras_same_second_do_not_overwrite(tmp_path):
+    timestamp = time.time()
+    frames = [np.full((48, 64, 3), value, dtype=np.uint8) for value in (0, 255)]
+    writers = [CaptureWriter(root=str(tmp_path), source=source) for source in (0, "rtsp://user:pw@10.0.0.2/stream1")]
+    paths = [write_one(writer, frame, timestamp)[0][0] for writer, frame in zip(writers, frames)]
+
+    assert paths[0] != paths[1]
+    assert all(os.path.isfile(path) for path in paths)
+    assert "pw" not in os.path.basename(paths[1])
+    means = [cv2.imread(path).mean() for path in paths]
+    assert means[0] < 10 and means[1] > 245   # هر فایل عکس دوربین خودش است
+
+
+def test_two_cameras_same_second_archive_chunks(tmp_path):
+    timestamp = time.time()
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    writers = [CaptureWriter(root=str(tmp_path), archive_max_bytes=1 << 20, source=source) for source in (0, 1)]
+    chunks = [write_one(writer, frame, timestamp)[0][0] for writer in writers]
+    assert chunks[0] != chunks[1]
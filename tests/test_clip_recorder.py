@@ -0,0 +1,45 @@
+# tests/test_clip_recorder.py
+import glob
+import os
+import time
+import numpy as np
+from core.clip_recorder import ClipRecorder
+
+
+def frame(value=128):
+    return np.full((48, 64, 3), value, dtype=np.uint8)
+
+
+def test_stop_writes_clip_with_unfinished_post_roll(tmp_path):
+    recorder = ClipRecorder(pre_sec=1.0, post_sec=30.0, width=None, root=str(tmp_path), source=0)
+    now = time.time()
+    for i in range(5):
+        recorder.submit(frame(), now + i * 0.1)
+    recorder.trigger("alert", now + 0.4)
+    recorder.stop()
+
+    assert recorder.written == 1
+    clips = glob.glob(os.path.join(str(tmp_path), "*", "clips", "*.mp4"))
+    assert len(clips) == 1 and os.path.basename(clips[0]).startswith("clip_cam0_")
+    assert not recorder.encode_thread.is_alive() and not recorder.write_thread.is_alive()
+
+
+def test_bad_segment_is_counted_and_next_clip_written(tmp_path):
+    recorder = ClipRecorder(pre_sec=1.0, post_sec=0.0, width=None, root=str(tmp_path))
+    now = time.time()
+    recorder.segments.put((now, "alert", [(now, np.frombuffer(b"not a jpeg", dtype=np.uint8))]))
+    for i in range(3):
+        recorder.submit(frame(), now + i * 0.1)
+    recorder.trigger("alert", now + 0.2)
+    recorder.stop()
+
+    assert recorder.errors == 1
+    assert recorder.written == 1
+
+
+def test_two_cameras_get_distinct_clip_names(tmp_path):
+    recorders = [ClipRecorder(root=str(tmp_path), source=source) for source in (0, 1)]
+    names = {os.path.basename(recorder.clip_path(0.0, "alert")) for recorder in recorders}
+    for recorder in recorders:
+        recorder.stop()
+    assert len(names) == 2
@@ -0,0 +1,49 @@
+# tests/test_event_store.py
+import sqlite3
+import time
+from core.event_store import EventStore
+
+CYCLE = dict(start=0.0, end=1.0, duration=1.0, frames=10, max_teeth=5, complete=True, alert=False, status="ok")
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_write_failure_keeps_writer_running(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), batch_size=1, flush_sec=0.01)
+    write = store.write
+    calls = []
+
+    def failing_write(conn, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        write(conn, batch)
+
+    store.write = failing_write
+    store.add_cycle(CYCLE)
+    assert wait_for(lambda: store.errors == 1)
+
+    store.add_cycle(dict(CYCLE, end=2.0))
+    store.add_capture(1.5, "a.jpg")
+    assert wait_for(lambda: store.written == 2)
+    store.stop()
+
+    assert store.thread.is_alive() is False
+    assert [row["end"] for row in store.cycles()] == [2.0]
+    assert len(store.captures(0.0, 10.0)) == 1
+    assert store.stats()["last_error"] == "database is locked"
+
+
+def test_queue_is_bounded(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), batch_size=1000, flush_sec=60.0, max_queue=3)
+    for i in range(5):
+        store.add_capture(float(i), f"{i}.jpg")
+    assert store.stats()["queue_depth"] == 3
+    assert store.dropped == 2
+    store.stop()
+    assert [row["time"] for row in store.captures(0.0, 10.0)] == [2.0, 3.0, 4.0]
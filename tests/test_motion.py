@@ -0,0 +1,36 @@
+# tests/test_motion.py
+import numpy as np
+from core.motion import MotionEstimator, MotionGate
+
+FPS = 30.0
+GATE_CONFIG = {"motion_threshold": 20, "idle_delay_sec": 0.2, "active_infer_interval_sec": 0.0,
+               "idle_infer_interval_sec": 2.0}
+
+
+def phases(step, decode_every, frames=60):
+    """فاز MotionGate روی فریم‌هایی که decode می‌شوند؛ بقیه‌ی فریم‌ها مثل CameraHandler فقط grab می‌شوند."""
+    motion, gate = MotionEstimator(width=32), MotionGate(GATE_CONFIG)
+    result, gap = [], 1
+    for i in range(frames):
+        if i % decode_every:
+            gap += 1   # فقط grab
+            continue
+        frame = np.full((24, 32, 3), (i * step) % 256, dtype=np.uint8)
+        result.append(gate.update(motion.update(frame, gap), False, i / FPS))
+        gap = 1
+    return result
+
+
+def test_motion_is_per_camera_frame():
+    motion = MotionEstimator(width=32)
+    motion.update(np.zeros((24, 32, 3), dtype=np.uint8))
+    assert motion.update(np.full((24, 32, 3), 30, dtype=np.uint8), gap=3) == 10.0
+
+
+def test_gate_does_not_depend_on_skip_rate():
+    # حرکت آرام (۴ در هر فریم، زیر آستانه): با هر نرخ skip شاول پارک (idle) می‌ماند
+    for decode_every in (1, 2, 4):
+        assert phases(step=4, decode_every=decode_every)[-1] == "idle"
+    # حرکت سریع (۲۵ در هر فریم، بالای آستانه): با هر نرخ skip فعال (active) است
+    for decode_every in (1, 2, 4):
+        assert phases(step=25, decode_every=decode_every, frames=9)[-1] == "active"
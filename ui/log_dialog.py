@@ -0,0 +1,249 @@
+# ui/log_dialog.py
+import time
+from datetime import datetime
+import cv2
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QSpinBox, QLabel,
+    QTableView, QListView, QAbstractItemView, QHeaderView, QSplitter
+)
+from PySide6.QtCore import Qt, QAbstractTableModel, QAbstractListModel, QModelIndex, QSize
+from PySide6.QtGui import QColor, QImage, QPixmap
+from core.capture_archive import read_jpeg
+from ui.thumbnails import ThumbnailLoader
+from config import config
+
+PAGE_SIZE = 200
+HEADERS = ("شروع", "مدت (ثانیه)", "حداکثر دندان", "وضعیت", "منبع")
+
+
+class CycleModel(QAbstractTableModel):
+    """چرخه‌ها (جدیدترین اول)؛ ردیف‌ها با canFetchMore/fetchMore فقط وقتی view به انتها می‌رسد
+    صفحه به صفحه (keyset روی (end, id)) از EventStore خوانده می‌شوند."""
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.filters = {}
+        self.rows = []
+        self.exhausted = True
+
+    def set_filters(self, **filters):
+        self.beginResetModel()
+        self.filters = filters
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        last = self.rows[-1] if self.rows else {}
+        page = self.store.cycles(until=last.get("end"), until_id=last.get("id"), limit=PAGE_SIZE, **self.filters)
+        self.exhausted = len(page) < PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return f"{datetime.fromtimestamp(row['start']):%Y-%m-%d %H:%M:%S}"
+            if column == 1:
+                return f"{row['duration']:.1f}"
+            if column == 2:
+                return str(row["max_teeth"])
+            if column == 3:
+                return row["status"] if row["complete"] else "تخلیه ناقص"
+            return row["source"] or ""
+        if role == Qt.ForegroundRole and row["alert"]:
+            return QColor(Qt.red)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return HEADERS[section]
+        return None
+
+
+class CaptureModel(QAbstractListModel):
+    """عکس‌های یک بازه‌ی زمانی (جدیدترین اول) با بارگذاری تنبل ردیف‌ها؛ تصویر کوچک هر ردیف فقط وقتی
+    view آن را رسم می‌کند از ThumbnailLoader خواسته می‌شود و با آماده شدنش همان ردیف به‌روز می‌شود."""
+
+    def __init__(self, store, thumbnails, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.thumbnails = thumbnails
+        self.range = None
+        self.rows = []
+        self.row_of = {}                 # id عکس -> شماره ردیف
+        self.exhausted = True
+        thumbnails.thumbnail_ready.connect(self.on_thumbnail)
+
+    def set_range(self, start, end, source=None):
+        self.beginResetModel()
+        self.range = (start, end, source)
+        self.rows = []
+        self.row_of = {}
+        self.exhausted = False
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        last = self.rows[-1] if self.rows else {}
+        page = self.store.captures(*self.range, limit=PAGE_SIZE, newest_first=True,
+                                   before=last.get("time"), before_id=last.get("id"))
+        self.exhausted = len(page) < PAGE_SIZE
+        if page:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+            self.rows.extend(page)
+            self.row_of.update((row["id"], i) for i, row in enumerate(page, first))
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{datetime.fromtimestamp(row['time']):%m-%d %H:%M:%S}"
+        if role == Qt.DecorationRole:
+            return self.thumbnails.get(row["id"], row["path"], row["offset"])
+        if role == Qt.ToolTipRole:
+            return f"{row['path']}\n{row['status'] or ''}  motion={row['motion']}  dets={row['dets']}"
+        return None
+
+    def on_thumbnail(self, key):
+        row = self.row_of.get(key)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class LogDialog(QDialog):
+    """نمایش چرخه‌های تخلیه‌ی ثبت‌شده در EventStore و عکس‌های ذخیره‌شده. هر دو لیست مجازی‌اند:
+    فقط ردیف‌های دیده‌شده رسم و صفحه به صفحه خوانده می‌شوند و تصاویر کوچک در پس‌زمینه decode می‌شوند.
+    بدون انتخاب چرخه، عکس‌های کل بازه‌ی فیلتر و با انتخاب، فقط عکس‌های همان چرخه نمایش داده می‌شوند."""
+
+    def __init__(self, store, parent=None, show_latency=None):
+        super().__init__(parent)
+        self.store = store
+        self.setWindowTitle("لاگ تخلیه‌ها")
+        self.resize(1100, 750)
+        self.layout = QVBoxLayout(self)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("روزهای اخیر:"))
+        self.days_spin = QSpinBox()
+        self.days_spin.setRange(1, 3650)
+        self.days_spin.setValue(30)
+        filter_layout.addWidget(self.days_spin)
+        self.alerts_check = QCheckBox("فقط هشدارها")
+        filter_layout.addWidget(self.alerts_check)
+        self.count_label = QLabel("")
+        filter_layout.addWidget(self.count_label, stretch=1)
+        all_btn = QPushButton("همه‌ی عکس‌ها")
+        all_btn.clicked.connect(self.show_all_captures)
+        filter_layout.addWidget(all_btn)
+        if show_latency is not None:
+            latency_btn = QPushButton("زمان مراحل پردازش")
+            latency_btn.clicked.connect(show_latency)
+            filter_layout.addWidget(latency_btn)
+        self.layout.addLayout(filter_layout)
+
+        self.cycles = CycleModel(store, self)
+        self.table = QTableView()
+        self.table.setModel(self.cycles)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)   # ارتفاع ردیف‌ها محاسبه نمی‌شود
+        self.table.verticalHeader().hide()
+        self.table.selectionModel().currentRowChanged.connect(self.show_cycle_captures)
+
+        thumb_width = config.get("log_thumb_width", 160)
+        self.thumbnails = ThumbnailLoader(
+            thumb_width, int(config.get("log_thumb_cache_mb", 64)) << 20, config.get("log_thumb_workers", 2), parent=self
+        )
+        self.captures = CaptureModel(store, self.thumbnails, self)
+        self.grid = QListView()
+        self.grid.setModel(self.captures)
+        self.grid.setViewMode(QListView.IconMode)
+        self.grid.setMovement(QListView.Static)
+        self.grid.setResizeMode(QListView.Adjust)
+        self.grid.setUniformItemSizes(True)          # بدون اندازه‌گیری تک‌تک آیتم‌ها
+        self.grid.setLayoutMode(QListView.Batched)
+        self.grid.setBatchSize(100)
+        self.grid.setIconSize(QSize(thumb_width, thumb_width * 9 // 16))
+        self.grid.setGridSize(QSize(thumb_width + 16, thumb_width * 9 // 16 + 32))
+        self.grid.doubleClicked.connect(self.show_capture)
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.grid)
+        splitter.setSizes([300, 450])
+        self.layout.addWidget(splitter, stretch=1)
+        self.captures_label = QLabel("")
+        self.layout.addWidget(self.captures_label)
+
+        self.days_spin.valueChanged.connect(self.reload)
+        self.alerts_check.toggled.connect(self.reload)
+        self.reload()
+
+    def filters(self):
+        return {"since": time.time() - self.days_spin.value() * 86400, "alerts_only": self.alerts_check.isChecked()}
+
+    def reload(self):
+        filters = self.filters()
+        self.count_label.setText(f"{self.store.count_cycles(**filters)} چرخه")
+        self.cycles.set_filters(**filters)
+        self.show_all_captures()
+
+    def show_all_captures(self):
+        self.table.clearSelection()
+        since = self.filters()["since"]
+        self.set_captures(since, time.time())
+
+    def show_cycle_captures(self, current, _previous):
+        if current.isValid():
+            cycle = self.cycles.rows[current.row()]
+            self.set_captures(cycle["start"], cycle["end"], cycle["source"])
+
+    def set_captures(self, start, end, source=None):
+        self.captures.set_range(start, end, source)
+        self.captures_label.setText(f"{self.store.count_captures(start, end, source)} عکس")
+
+    def show_capture(self, index):
+        """نمایش عکس با اندازه‌ی کامل (یک decode در نخ UI)."""
+        row = self.captures.rows[index.row()]
+        try:
+            frame = cv2.imdecode(read_jpeg(row["path"], row["offset"]), cv2.IMREAD_COLOR)
+        except Exception:   # عکس حذف‌شده یا chunk ناقص؛ مثل thumbnail فقط نمایش داده نمی‌شود
+            frame = None
+        if frame is None:
+            return
+        h, w = frame.shape[:2]
+        image = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        dlg = QDialog(self)
+        dlg.setWindowTitle(f"{datetime.fromtimestamp(row['time']):%Y-%m-%d %H:%M:%S}")
+        label = QLabel(dlg)
+        label.setPixmap(QPixmap.fromImage(image).scaled(1280, 720, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        QVBoxLayout(dlg).addWidget(label)
+        dlg.exec()
+
+    def done(self, result):
+        self.thumbnails.stop()
+        super().done(result)
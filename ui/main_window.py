@@ -1,15 +1,26 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QLabel, QPushButton,
-    QHBoxLayout, QVBoxLayout
+    QHBoxLayout, QVBoxLayout, QMessageBox
 )
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtCore import Qt, QTimer, QObject, Signal
+from PySide6.QtGui import QImage, QPixmap, QFont
+import cv2
+import time
 import numpy as np
 from ui.settings_dialog import SettingsDialog
+from ui.log_dialog import LogDialog
+from ui.overlay import draw_detections
 from core.camera_handler import CameraHandler
-from core.bucket_monitor import BucketMonitor
+from core.process_pipeline import ProcessPipeline
+from core.latency import latency
+from core.event_store import event_store_from_config
 from config import config
 
+class FrameNotifier(QObject):
+    """پل بین نخ پردازش و نخ UI: emit از هر نخی امن است و slot در نخ UI اجرا می‌شود."""
+    frame_ready = Signal(object)
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -55,7 +66,7 @@ class MainWindow(QMainWindow):
         self.log_btn = QPushButton("نمایش لاگ")
         self.log_btn.setMinimumWidth(160)
         self.log_btn.setStyleSheet("background-color: #388e3c; color: #fff; font-size: 18px; font-weight: bold;")
-        # فعلاً بدون رویداد
+        self.log_btn.clicked.connect(self.show_log)
 
         btns_layout.addWidget(self.settings_btn)
         btns_layout.addWidget(self.log_btn)
@@ -81,54 +92,107 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_widget)
 
         # ---- پردازش و مانیتورینگ ----
-        self.camera = CameraHandler()
-        self.monitor = BucketMonitor(config)
-
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_frame)
-        self.timer.start(30)
+        self.camera = ProcessPipeline() if config.get("process_pipeline", False) else CameraHandler()
+        self.events = event_store_from_config(config)   # فقط خواندن برای پنجره‌ی لاگ؛ نوشتن در pipeline
+
+        self.display_buffer = None       # بافر تصویر کوچک‌شده برای نمایش
+        self.last_seq = None             # شماره آخرین فریم نمایش داده‌شده
+        self.t_resize = latency.timer("resize")
+        self.t_annotate = latency.timer("annotate")
+        self.t_qt_convert = latency.timer("qt_convert")
+
+        # ذخیره‌ی دوره‌ای آمار زمان‌بندی مراحل
+        self.latency_timer = QTimer()
+        self.latency_timer.timeout.connect(self.dump_latency)
+        self.latency_timer.start(int(config.get("latency_dump_interval_sec", 60) * 1000))
+
+        # به‌روزرسانی فقط وقتی نتیجه‌ی جدید هست (به جای تایمر ۳۰ میلی‌ثانیه‌ای)؛
+        # مانیتور سطل داخل pipeline با نرخ پردازش اجرا می‌شود
+        self.notifier = FrameNotifier()
+        self.notifier.frame_ready.connect(self.on_result)
+        self.camera.add_listener(self.notifier.frame_ready.emit)
+
+    def closeEvent(self, event):
+        self.camera.stop()
+        super().closeEvent(event)
 
     def show_settings(self):
         dlg = SettingsDialog(self)
         dlg.exec()
+        if config.get("process_pipeline", False):
+            self.camera.sync_config()
         self.status_label.setText("تنظیمات باز شد!")
 
-    def update_frame(self):
-        frame, dets = self.camera.get_processed_frame_with_dets()
-        if frame is not None:
-            rgb = frame[..., ::-1]
-            rgb = np.ascontiguousarray(rgb)
-            h, w, ch = rgb.shape
-            img = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
-            pixmap = QPixmap.fromImage(img)
-            screen_size = self.image_label.size()
-            if screen_size.width() == 0 or screen_size.height() == 0:
-                screen_size = self.size()
-            scaled_pixmap = pixmap.scaled(
-                screen_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
+    def show_log(self):
+        if self.events is None:
+            self.show_latency()
+            return
+        LogDialog(self.events, self, self.show_latency).exec()
+
+    def latency_snapshot(self):
+        # در حالت چندپردازه‌ای آمار پردازه‌های Capture و inference هم اضافه می‌شود
+        return latency.snapshot(getattr(self.camera, "remote_latency", {}).values())
+
+    def dump_latency(self):
+        return latency.dump(config.get("latency_dump_path", "logs/latency.json"), self.latency_snapshot())
+
+    def show_latency(self):
+        path = self.dump_latency()
+        box = QMessageBox(self)
+        box.setWindowTitle("زمان مراحل پردازش")
+        box.setText(latency.report(self.latency_snapshot()) + f"\n\n-> {path}")
+        box.setFont(QFont("monospace"))
+        box.exec()
+
+    def show_frame(self, frame, dets):
+        """اول کوچک کردن فریم به اندازه نمایش، بعد رسم دت‌ها روی همان تصویر کوچک
+        و ساخت QImage مستقیم از بافر BGR (بدون تبدیل رنگ و بدون scale دوباره)."""
+        screen_size = self.image_label.size()
+        if screen_size.width() == 0 or screen_size.height() == 0:
+            screen_size = self.size()
+        h, w = frame.shape[:2]
+        scale = min(screen_size.width() / w, screen_size.height() / h)
+        size = (max(int(w * scale), 1), max(int(h * scale), 1))
+
+        if self.display_buffer is None or self.display_buffer.shape[1::-1] != size:
+            self.display_buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        with self.t_resize:
+            display = cv2.resize(frame, size, dst=self.display_buffer, interpolation=interpolation)
+        with self.t_annotate:
+            draw_detections(
+                display, dets, scale,
+                draw_boxes=config.get("draw_boxes", True),
+                show_area_values=config.get("show_area_values", False),
             )
-            self.image_label.setPixmap(scaled_pixmap)
-
-            # --- وضعیت الگوریتم سلامت ---
-            bucket_area = 0
-            teeth_areas = []
-            for det in dets:
-                if det["class"] == "bucket":
-                    bucket_area = det["area"]
-                elif det["class"] == "teeth":
-                    teeth_areas.append(det["area"])
-            motion_change = 0
-            self.monitor.update(bucket_area, teeth_areas, motion_change)
-            current_status = self.monitor.get_status()
-            self.status_label.setText(current_status)
-
-            # پیام مانیتورینگ وسط (لحظه‌ای)
-            event_msg = self.monitor.get_event()
-            if event_msg:
-                self.event_label.setText(event_msg)
-                # پاک‌سازی پیام بعد از ۲ ثانیه
-                QTimer.singleShot(3000, lambda: self.event_label.setText(""))
-                # پیام رو بعد از نمایش خالی کن (تا دوباره تکراری نشه)
-                self.monitor.clear_event()
+
+        with self.t_qt_convert:
+            img = QImage(display.data, size[0], size[1], display.strides[0], QImage.Format_BGR888)
+            self.image_label.setPixmap(QPixmap.fromImage(img))
+
+    def record_display(self, meta):
+        """تأخیر Capture تا نمایش، کهنگی دت‌ها نسبت به فریم نمایش‌داده‌شده و فریم‌هایی که نمایش داده نشدند."""
+        latency.record("capture_to_display", time.monotonic() - meta["captured"])
+        if meta["dets_seq"] >= 0:
+            latency.record("dets_staleness", meta["captured"] - meta["dets_captured"])
+        if self.last_seq is not None and meta["seq"] > self.last_seq + 1:
+            latency.count("frames_not_displayed", meta["seq"] - self.last_seq - 1)
+        latency.count("frames_displayed")
+        self.last_seq = meta["seq"]
+
+    def on_result(self, meta):
+        # پیام‌ها و وضعیت مانیتور از همان نتیجه‌ی ارسال‌شده خوانده می‌شوند تا هیچ پیامی از دست نرود
+        self.status_label.setText(meta["status"])
+        if meta["event"]:
+            self.event_label.setText(meta["event"])
+            # پاک‌سازی پیام بعد از ۳ ثانیه
+            QTimer.singleShot(3000, lambda: self.event_label.setText(""))
+        self.update_frame()
+
+    def update_frame(self):
+        # اگر UI عقب بماند چند سیگنال پشت هم می‌رسند؛ فقط آخرین فریم یک بار رسم می‌شود
+        frame, dets, meta = self.camera.get_latest()
+        if frame is None or meta["seq"] == self.last_seq:
+            return
+        self.show_frame(frame, dets)
+        self.record_display(meta)
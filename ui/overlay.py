@@ -0,0 +1,51 @@
+# ui/overlay.py
+import cv2
+from coreYoloV5.utils.plots import colors
+
+CLASS_INDEX = {"bucket": 0, "teeth": 1}   # برای انتخاب رنگ ثابت هر کلاس
+
+
+def draw_detections(img, dets, scale, draw_boxes=True, show_area_values=False):
+    """رسم باکس‌ها و متن کالیبراسیون روی تصویر نمایش (که قبلاً با ضریب scale کوچک شده)."""
+    if draw_boxes:
+        for det in dets:
+            x1, y1, x2, y2 = (int(v * scale) for v in det["bbox"])
+            color = colors(CLASS_INDEX.get(str(det["class"]), 2), True)
+            label = str(det["class"]) if not det["id"] else f"{det['class']} #{det['id']}"
+            cv2.rectangle(img, (x1, y1), (x2, y2), color, 2, cv2.LINE_AA)
+            cv2.putText(img, label, (x1, max(y1 - 4, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+
+    # --- رسم متن کالیبراسیون (مساحت‌ها در مختصات تصویر اصلی) ---
+    if show_area_values and len(dets) > 0:
+        lines = []
+        bucket_idx = 1
+        teeth_idx = 1
+        for det in dets:
+            label = det["class"]
+            area = int(det["area"])
+            if label == "bucket":
+                lines.append(f"Bucket #{bucket_idx}: {area}")
+                bucket_idx += 1
+            elif label == "teeth":
+                lines.append(f"Teeth #{teeth_idx}: {area}")
+                teeth_idx += 1
+
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        font_scale = 0.6
+        thickness = 1
+        color_text = (0, 255, 0)  # سبز روشن
+
+        margin = 10
+        line_height = 20
+        x = margin
+        y = img.shape[0] - margin
+
+        box_width = 250
+        box_height = line_height * len(lines) + 10
+
+        cv2.rectangle(img, (x - 5, y - box_height), (x + box_width, y + 5), (0, 0, 0), cv2.FILLED)
+
+        for i, line in enumerate(lines):
+            text_pos = (x, y - line_height * (len(lines) - i - 1))
+            cv2.putText(img, line, text_pos, font, font_scale, color_text, thickness, cv2.LINE_AA)
+    return img
@@ -0,0 +1,105 @@
+# ui/thumbnails.py
+import threading
+from collections import OrderedDict, deque
+import cv2
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QImage, QPixmap
+from core.capture_archive import read_jpeg
+from core.latency import latency
+
+
+class ThumbnailLoader(QObject):
+    """decode تصویر کوچک عکس‌ها در چند نخ پس‌زمینه با IMREAD_REDUCED_COLOR_4 (decode مستقیم با ۱/۴ اندازه)
+    و نگه داشتن QPixmap ها در یک LRU با سقف حافظه. درخواست‌ها LIFO هستند و صف آن‌ها محدود است،
+    پس هنگام اسکرول سریع اول ردیف‌های فعلاً دیده‌شده decode می‌شوند و درخواست‌های کهنه دور ریخته می‌شوند.
+    cache فقط در نخ UI تغییر می‌کند؛ با هر تصویر آماده thumbnail_ready(key) فرستاده می‌شود."""
+
+    thumbnail_ready = Signal(object)
+    decoded = Signal(object, object)     # (key, QImage) از نخ‌های decode به نخ UI
+
+    def __init__(self, width=160, max_bytes=64 << 20, workers=2, max_pending=64, parent=None):
+        super().__init__(parent)
+        self.width = width
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self.cache = OrderedDict()       # key -> QPixmap (جدیدترین استفاده در انتها)
+        self.cache_bytes = 0
+        self.pending = deque()           # (key, path, offset)
+        self.queued = set()              # key های در صف یا در حال decode
+        self.failed = set()              # عکس‌های ناموجود/خراب (دوباره decode نمی‌شوند)
+        self.cond = threading.Condition()
+        self.running = True
+        self.t_decode = latency.timer("thumb_decode")
+        self.decoded.connect(self.store)
+        self.threads = [threading.Thread(target=self.run, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def get(self, key, path, offset=None):
+        """QPixmap موجود در cache یا None (در این صورت decode آن در پس‌زمینه درخواست می‌شود)."""
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            self.cache.move_to_end(key)
+            return pixmap
+        if key in self.failed:
+            return None
+        with self.cond:
+            if key not in self.queued:
+                self.queued.add(key)
+                self.pending.append((key, path, offset))
+                while len(self.pending) > self.max_pending:
+                    self.queued.discard(self.pending.popleft()[0])
+                self.cond.notify()
+        return None
+
+    def run(self):
+        while self.running:
+            with self.cond:
+                while not self.pending and self.running:
+                    self.cond.wait(0.5)
+                if not self.running:
+                    return
+                key, path, offset = self.pending.pop()   # جدیدترین درخواست اول
+            try:
+                with self.t_decode:
+                    image = self.decode(path, offset)
+            except Exception:
+                image = None   # هر خطایی: key حتماً از queued خارج و failed شود، نخ هم زنده بماند
+            self.decoded.emit(key, image)
+
+    def decode(self, path, offset):
+        try:
+            frame = cv2.imdecode(read_jpeg(path, offset), cv2.IMREAD_REDUCED_COLOR_4)
+        except Exception:   # فایل ناموجود (OSError)، رکورد ناقص (struct.error)، JPEG خراب (cv2.error)
+            frame = None
+        if frame is None:
+            return None
+        h, w = frame.shape[:2]
+        if w > self.width:
+            frame = cv2.resize(frame, (self.width, max(int(h * self.width / w), 1)), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+        # QImage روی بافر numpy ساخته و کپی می‌شود تا بعد از آزاد شدن آرایه معتبر بماند
+        return QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888).copy()
+
+    def store(self, key, image):
+        """در نخ UI: تبدیل به QPixmap، اضافه به LRU و حذف قدیمی‌ترین‌ها تا زیر سقف حافظه."""
+        with self.cond:
+            self.queued.discard(key)
+        if image is None:
+            self.failed.add(key)
+            return
+        pixmap = QPixmap.fromImage(image)
+        self.cache[key] = pixmap
+        self.cache_bytes += pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        while self.cache_bytes > self.max_bytes and len(self.cache) > 1:
+            _, old = self.cache.popitem(last=False)
+            self.cache_bytes -= old.width() * old.height() * old.depth() // 8
+        self.thumbnail_ready.emit(key)
+
+    def stats(self):
+        return {"cached": len(self.cache), "cache_bytes": self.cache_bytes, "pending": len(self.pending)}
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()